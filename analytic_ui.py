@@ -2,14 +2,14 @@
 @file analytics_ui.py
 @brief analytic UI based on sales_history data
 """
+import time
 import customtkinter as ctk
 from tkinter import ttk, messagebox
-import pandas as pd 
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import os
-from datetime import datetime
+from charts import RevenueChart, CategoryChart
+from analytics_worker import AnalyticsWorker
 import custom_function as cf 
+import instrument
 
 class AnalyticsFrame(ctk.CTkFrame):
     def __init__(self, parent, data_manager):
@@ -18,36 +18,35 @@ class AnalyticsFrame(ctk.CTkFrame):
         
         self.view_mode = "Day" 
         
-        #load data
-        self.full_data_list = self.load_data_as_dicts() 
-        self.current_data = self.full_data_list.copy()
-
-        # print(self.full_data_list)
+        # dashboard results, read from the data manager rollup tables
+        self.current_data = None
+        # category or (category, product) -> treeview item id
+        self.tree_iids = {}
+
+        # dashboard data is computed on a worker thread, the UI only renders
+        self.worker = AnalyticsWorker(lambda key: self.data_manager.dashboard_data(*key))
+        self.worker.start()
+        self._refresh_job = None
+        self._poll_job = None
+        # generation of the request the poll loop waits for, None when nothing is pending
+        self._pending = None
+        self._submitted = 0.0
+        # (filter key, data version) of the data on screen, refreshes with nothing new are skipped
+        self.shown = None
+        self.active = False
+        self.data_manager.subscribe(self._on_sales)
         
         self._setup_styles()
         self._create_layout()
         
         # set initial date 
-        if self.full_data_list:
-            # sort by time stamp
-            sorted_data = cf.new_sort(self.full_data_list, key=lambda x: x['timestamp'])
-            min_date = sorted_data[0]['timestamp'].strftime('%Y-%m-%d')
-            max_date = sorted_data[-1]['timestamp'].strftime('%Y-%m-%d')
-            self.entry_start.insert(0, min_date)
-            self.entry_end.insert(0, max_date)
+        min_ts, max_ts = self.data_manager.history_bounds()
+        if min_ts is not None:
+            self.entry_start.insert(0, str(min_ts)[:10])
+            self.entry_end.insert(0, str(max_ts)[:10])
+        self.latest_day = str(max_ts)[:10] if max_ts is not None else None
             
-        self.refresh_dashboard()
-
-    def load_data_as_dicts(self):
-        """
-        load csv and converts immediately to a list of dictionaries.
-        """
-        filename = 'sales_history.csv'
-        if os.path.exists(filename):
-            df = pd.read_csv(filename)
-            df['timestamp'] = pd.to_datetime(df['timestamp']).dt.to_pydatetime()
-            return df.to_dict('records')
-        return []
+        self.refresh_dashboard(delay=0)
 
     def _setup_styles(self):
         style = ttk.Style()
@@ -64,6 +63,9 @@ class AnalyticsFrame(ctk.CTkFrame):
         header_frame.grid(row=0, column=0, sticky="ew", padx=20, pady=(20, 10))
         
         ctk.CTkLabel(header_frame, text="Sales Analytics", font=("Segoe UI", 24, "bold")).pack(side="left", padx=(0, 20))
+
+        self.lbl_status = ctk.CTkLabel(header_frame, text="", text_color="gray", font=("Arial", 10))
+        self.lbl_status.pack(side="left", padx=(0, 10))
         
         #filter
         filter_frame = ctk.CTkFrame(header_frame, fg_color="transparent")
@@ -79,6 +81,10 @@ class AnalyticsFrame(ctk.CTkFrame):
 
         ctk.CTkButton(header_frame, text="Apply Filter", width=80, command=self.refresh_dashboard).pack(side="right", padx=10)
 
+        self.mode_switch = ctk.CTkSegmentedButton(header_frame, values=["Day", "Month"], command=self.on_time_change)
+        self.mode_switch.set(self.view_mode)
+        self.mode_switch.pack(side="right", padx=10)
+
         #stat card
         self.stat_frame = ctk.CTkFrame(self, fg_color="transparent")
         self.stat_frame.grid(row=1, column=0, sticky="ew", padx=20, pady=10)
@@ -101,6 +107,15 @@ class AnalyticsFrame(ctk.CTkFrame):
         self.chart_frame_cat = ctk.CTkFrame(charts_container)
         self.chart_frame_cat.grid(row=0, column=1, sticky="nsew", padx=(10, 0))
 
+        # figures and canvases are created once and redrawn in place
+        self.chart_hist = RevenueChart()
+        self.canvas_hist = FigureCanvasTkAgg(self.chart_hist.figure, master=self.chart_frame_hist)
+        self.canvas_hist.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+
+        self.chart_cat = CategoryChart()
+        self.canvas_cat = FigureCanvasTkAgg(self.chart_cat.figure, master=self.chart_frame_cat)
+        self.canvas_cat.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+
         #table
         table_container = ctk.CTkFrame(self)
         table_container.grid(row=3, column=0, sticky="nsew", padx=20, pady=(10, 20))
@@ -128,14 +143,104 @@ class AnalyticsFrame(ctk.CTkFrame):
         self.view_mode = value
         self.refresh_dashboard()
 
-    def refresh_dashboard(self):
+    def update_stats(self):
+        """
+        @brief refresh when the tab is shown, rollups already include new checkouts
+        """
+        self.active = True
+        self.refresh_dashboard(delay=0)
+
+    def hide(self):
+        self.active = False
+
+    def _on_sales(self, seq, rows):
+        """
+        @brief data manager checkout event, refresh live only while the tab is shown
+        """
+        newest = max(str(row['timestamp'])[:10] for row in rows)
+        # an end date on the latest sale day follows new sales
+        if self.entry_end.get().strip() == self.latest_day and newest > self.latest_day:
+            self.entry_end.delete(0, "end")
+            self.entry_end.insert(0, newest)
+        if self.latest_day is None or newest > self.latest_day:
+            self.latest_day = newest
+
+        end = self.entry_end.get().strip()
+        if self.active and (not end or min(str(row['timestamp'])[:10] for row in rows) <= end):
+            self.refresh_dashboard()
+
+    def refresh_dashboard(self, delay=150):
+        """
+        @brief debounce Apply clicks, mode switches and tab switches into one request
+        @param delay milliseconds to wait for another refresh before computing
+        """
+        if self._refresh_job is not None:
+            self.after_cancel(self._refresh_job)
+        self._refresh_job = self.after(delay, self._request_dashboard)
+
+    def _request_dashboard(self):
+        self._refresh_job = None
+
         # filter
-        start_str = self.entry_start.get()
-        end_str = self.entry_end.get()
-        
-        self.current_data = cf.filter_data_by_date(self.full_data_list, start_str, end_str)
+        start_date = cf.parse_date(self.entry_start.get())
+        end_date = cf.parse_date(self.entry_end.get())
+        key = (start_date.date() if start_date else None,
+               end_date.date() if end_date else None,
+               self.view_mode)
+        if self.shown == (key, self.data_manager.data_version()):
+            # back to what is on screen, drop any request still running
+            self.worker.cancel()
+            self.lbl_status.configure(text="")
+            return
+
+        # same range and data as an earlier request, no need for the worker
+        data = self.data_manager.cached_dashboard(*key)
+        if data is not None:
+            self.worker.cancel()
+            self.lbl_status.configure(text="")
+            self.shown = (key, data["version"])
+            self._render(data)
+            return
+
+        # newer request cancels the in-flight one
+        self._pending = self.worker.submit(key)
+        self._submitted = time.perf_counter()
+        self.lbl_status.configure(text="updating...")
+
+        if self._poll_job is None:
+            self._poll_job = self.after(30, self._poll_worker)
 
-        if not self.current_data:
+    def _poll_worker(self):
+        """
+        @brief pick up the worker result on the Tk thread
+        """
+        self._poll_job = None
+        done = self.worker.poll()
+        if done is None:
+            # a cancelled request never delivers, stop polling for it
+            if self._pending is not None and self.worker.is_current(self._pending):
+                self._poll_job = self.after(30, self._poll_worker)
+            else:
+                self._pending = None
+            return
+
+        self._pending = None
+        key, data, error = done
+        self.lbl_status.configure(text="")
+        if instrument.enabled():
+            # filter request to result on the Tk thread, queueing and compute included
+            instrument.record("analytics.request_latency", time.perf_counter() - self._submitted)
+        if error is not None:
+            messagebox.showerror("Analytics", f"Failed to compute dashboard: {error}")
+            return
+        self.shown = (key, data["version"])
+        self._render(data)
+
+    @instrument.timed("analytics.render")
+    def _render(self, data):
+        self.current_data = data
+
+        if not self.current_data["series"][0]:
             self.card_revenue.configure(text="Rp 0")
             self.card_orders.configure(text="0 Items")
             self.card_top.configure(text="-")
@@ -144,9 +249,7 @@ class AnalyticsFrame(ctk.CTkFrame):
             return
 
         #calculate stat
-        prod_map = {row['name']: row['category'] for _, row in self.data_manager.df_products.iterrows()}
-        
-        total_rev, total_qty, top_cat = cf.get_stats(self.current_data, prod_map)
+        total_rev, total_qty, top_cat = self.current_data["stats"]
         
         self.card_revenue.configure(text=f"Rp {total_rev:,.0f}")
         self.card_orders.configure(text=f"{total_qty} Items")
@@ -158,93 +261,76 @@ class AnalyticsFrame(ctk.CTkFrame):
         self._update_treeview()
 
     def _clear_charts(self):
-        for widget in self.chart_frame_hist.winfo_children(): widget.destroy()
+        self.chart_hist.clear()
+        self.chart_cat.clear()
+        self.canvas_hist.draw_idle()
+        self.canvas_cat.draw_idle()
+
+    def destroy(self):
+        for job in (self._refresh_job, self._poll_job):
+            if job is not None:
+                self.after_cancel(job)
+        self.worker.stop()
+        self.data_manager.unsubscribe(self._on_sales)
+        self.chart_hist.close()
+        self.chart_cat.close()
+        super().destroy()
         
     def _clear_tree(self):
-        for item in self.tree.get_children(): self.tree.delete(item)
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self.tree_iids = {}
 
+    @instrument.timed("analytics.render.revenue_chart")
     def plot_revenue_history(self):
-        self._clear_charts()
-
-        dates, revenues = cf.group_by_time(self.current_data, self.view_mode)
-        print(dates,revenues)
-
-        #figure
-        fig, ax = plt.subplots(figsize=(5, 3), dpi=100)
-        fig.patch.set_facecolor('#2b2b2b')
-        ax.set_facecolor('#2b2b2b')
-
-        #adjust bar width
-        width = 0.8 if self.view_mode == "Day" else 20
-
-        #plot
-        ax.bar(dates, revenues, color="#ff0000", alpha=0.8, width=width, label="Actual")
-
-        #style
-        ax.set_title(f"daily revenue", color="white", fontsize=10)
-        ax.tick_params(axis='x', colors="white", rotation=45, labelsize=8)
-        ax.tick_params(axis='y', colors="white", labelsize=8)
-
-        #border
-        for spine in ("bottom",):
-            ax.spines[spine].set_color("white")
-        for spine in ("top", "right", "left"):
-            ax.spines[spine].set_visible(False)
-
-        #spine
-        ax.legend(
-            loc="upper left",
-            fontsize=8,
-            facecolor='#2b2b2b',
-            edgecolor='white',
-            labelcolor='white'
-        )
-
-        plt.tight_layout()
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_frame_hist)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
+        dates, revenues = self.current_data["series"]
+        self.chart_hist.update(dates, revenues, self.view_mode)
+        self.canvas_hist.draw_idle()
 
     # piechart
+    @instrument.timed("analytics.render.category_chart")
     def plot_category_dist(self):
-        cat_counts = {}
-        for row in self.current_data:
-            c = row.get('category', 'Uncategorized')
-            cat_counts[c] = cat_counts.get(c, 0) + row['total']
-            
-        if not cat_counts: 
-            return
-
-        labels = list(cat_counts.keys())
-        values = list(cat_counts.values())
-
-        fig, ax = plt.subplots(figsize=(4, 3), dpi=100)
-        fig.patch.set_facecolor('#2b2b2b')
-        
-        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90,
-            textprops={'color': "white", 'fontsize': 8}, pctdistance=0.85,
-            wedgeprops=dict(width=0.5))
-        
-        ax.set_title("Sales by Category", color="white", fontsize=10)
-        plt.tight_layout()
-        
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_frame_cat)
-        canvas.draw()
-        canvas.get_tk_widget().pack(fill="both", expand=True, padx=5, pady=5)
-
+        self.chart_cat.update(self.current_data["categories"])
+        self.canvas_cat.draw_idle()
 
+    @instrument.timed("analytics.render.tree")
     def _update_treeview(self):
-        self._clear_tree()
-        
+        """
+        @brief apply the new hierarchy as a diff: update values in place,
+        insert new categories/products and delete the ones no longer present
+        """
         # get data hierachy
         # struc: {cat: {total_rev, total_qty, products: {prod: {rev, qty}}}}
-        tree_data = cf.group_hierarchy(self.current_data)
-        
+        tree_data = self.current_data["hierarchy"]
+        seen = set()
+
         for cat_name, cat_data in tree_data.items():
-            parent_id = self.tree.insert("", "end", text=cat_name, 
-                                    values=(f"Rp {cat_data['total_rev']:,.0f}", cat_data['total_qty']), 
-                                    open=False)
-            
+            values = (f"Rp {cat_data['total_rev']:,.0f}", cat_data['total_qty'])
+            parent_id = self._upsert_tree_item(cat_name, "", cat_name, values)
+            seen.add(cat_name)
+
             for prod_name, prod_data in cat_data['products'].items():
-                self.tree.insert(parent_id, "end", text=prod_name, 
-                            values=(f"Rp {prod_data['rev']:,.0f}", prod_data['qty']))
\ No newline at end of file
+                key = (cat_name, prod_name)
+                self._upsert_tree_item(key, parent_id, prod_name, (f"Rp {prod_data['rev']:,.0f}", prod_data['qty']))
+                seen.add(key)
+
+        # products before their categories, a deleted parent takes its children with it
+        stale = [key for key in self.tree_iids if key not in seen]
+        for key in sorted(stale, key=lambda k: isinstance(k, str)):
+            iid = self.tree_iids.pop(key)
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+
+    def _upsert_tree_item(self, key, parent, text, values):
+        """
+        @brief update an existing item's cells or insert it
+        @return item id
+        """
+        iid = self.tree_iids.get(key)
+        if iid is None:
+            iid = self.tree.insert(parent, "end", text=text, values=values, open=False)
+            self.tree_iids[key] = iid
+        else:
+            self.tree.item(iid, values=values)
+        return iid
@@ -0,0 +1,97 @@
+"""
+@file analytics_worker.py
+@brief compute dashboard data off the Tk main thread.
+UI submit -> latest request slot -> worker thread -> result queue -> UI via after()
+"""
+import queue
+import threading
+
+from scan_pipeline import LatestSlot
+
+class AnalyticsWorker:
+    """
+    @brief runs compute(key) on one background thread, newest request wins
+    @param compute function key -> result, e.g. DataManager.dashboard_data, which memoizes
+    results per data version itself
+    """
+    def __init__(self, compute):
+        self.compute = compute
+
+        self.requests = LatestSlot()
+        self.results = queue.Queue()
+
+        # every submit gets a new generation, older ones are cancelled
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._running = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._thread = threading.Thread(target=self._loop, name="analytics-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running.clear()
+        self.requests.wake()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, key):
+        """
+        @brief request a fresh result for key, cancelling any older request
+        @return generation of the request
+        """
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+        # a request still waiting in the slot is overwritten and never computed
+        self.requests.put((generation, key))
+        return generation
+
+    def cancel(self):
+        """
+        @brief drop the pending request and ignore the result of the running one
+        """
+        with self._lock:
+            self._generation += 1
+        self.requests.take(timeout=0)
+
+    def is_current(self, generation):
+        with self._lock:
+            return generation == self._generation
+
+    def _loop(self):
+        while self._running.is_set():
+            item = self.requests.take(timeout=0.1)
+            if item is None:
+                continue
+            generation, key = item
+            if not self.is_current(generation):
+                continue
+            try:
+                result, error = self.compute(key), None
+            except Exception as e:
+                result, error = None, e
+            # superseded while computing, nobody is waiting for it
+            if self.is_current(generation):
+                self.results.put((generation, key, result, error))
+
+    def poll(self):
+        """
+        @brief newest finished result for the current request, without blocking
+        @return (key, result, error) or None
+        """
+        latest = None
+        while True:
+            try:
+                generation, key, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if not self.is_current(generation):
+                continue
+            latest = (key, result, error)
+        return latest
@@ -0,0 +1,139 @@
+"""
+@file batch_decode.py
+@brief headless batch QR decoding of an image directory with a process pool.
+usage: python batch_decode.py <image dir> [--workers N] [--format csv|jsonl] [--output file]
+every decoded code is resolved against the product catalog CSV, read once into a
+ProductStore; the sales history is never opened.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from multiprocessing import Pool
+
+import cv2
+import pandas as pd
+
+import qr_decoder
+from product_store import ProductStore
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+RESULT_COLUMNS = ["image", "qr_data", "found", "name", "price", "category"]
+
+_decoder = None
+
+def _init_worker(strategy, backend_name):
+    global _decoder
+    # one process per core already, keep OpenCV from spawning its own threads
+    cv2.setNumThreads(1)
+    backend = qr_decoder.opencv_backend if backend_name == "opencv" else qr_decoder.pyzbar_backend
+    _decoder = qr_decoder.QRDecoder(strategy, backend=backend)
+
+def _decode_file(path):
+    """
+    @brief decode one image in a worker process
+    @return (path, list of codes)
+    """
+    image = cv2.imread(path)
+    if image is None:
+        return path, []
+    # images are unrelated, never reuse a region from the previous one
+    _decoder.roi = None
+    return path, _decoder(image)
+
+def list_images(directory):
+    """
+    @brief image files of a directory, recursively, in a stable order
+    """
+    found = []
+    for root, _, files in os.walk(directory):
+        for f in files:
+            if f.lower().endswith(IMAGE_EXTENSIONS):
+                found.append(os.path.join(root, f))
+    found.sort()
+    return found
+
+def decode_images(paths, workers=None, strategy="downscale", backend="pyzbar", chunksize=16):
+    """
+    @brief decode images on a process pool, results come back in input order
+    @param workers number of processes, None for every core, 1 to decode in process
+    @return iterator of (path, list of codes)
+    """
+    if workers == 1:
+        _init_worker(strategy, backend)
+        for path in paths:
+            yield _decode_file(path)
+        return
+    with Pool(workers, initializer=_init_worker, initargs=(strategy, backend)) as pool:
+        yield from pool.imap(_decode_file, paths, chunksize=chunksize)
+
+def load_catalog(products_file):
+    """
+    @brief product catalog CSV as a ProductStore for QR lookups, empty when the file is missing
+    """
+    if not os.path.exists(products_file):
+        return ProductStore()
+    return ProductStore.from_dataframe(pd.read_csv(products_file, dtype={"qr_data": str}))
+
+def resolve(results, products):
+    """
+    @brief look every decoded code up in the catalog
+    @param products ProductStore
+    @return iterator of dicts with RESULT_COLUMNS keys, one per code (or per image without codes)
+    """
+    for path, codes in results:
+        if not codes:
+            yield {"image": path, "qr_data": "", "found": False, "name": "", "price": "", "category": ""}
+        for code in codes:
+            row = products.find_by_qr(code)
+            if row is None:
+                yield {"image": path, "qr_data": code, "found": False, "name": "", "price": "", "category": ""}
+            else:
+                product = products.get(row)
+                yield {"image": path, "qr_data": code, "found": True, "name": product['name'],
+                       "price": product['price'], "category": product['category']}
+
+def write_results(rows, out, fmt="csv"):
+    """
+    @brief stream rows as CSV or JSON lines
+    @return number of rows written
+    """
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    else:
+        for row in rows:
+            out.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="decode QR codes in a directory of images")
+    parser.add_argument("directory")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--output", default="-", help="output file, - for stdout")
+    parser.add_argument("--strategy", choices=qr_decoder.STRATEGIES, default="downscale")
+    parser.add_argument("--backend", choices=["pyzbar", "opencv"], default="pyzbar")
+    parser.add_argument("--products", default="products.csv", help="product catalog CSV")
+    args = parser.parse_args()
+
+    products = load_catalog(args.products)
+
+    paths = list_images(args.directory)
+    results = decode_images(paths, args.workers, args.strategy, args.backend)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        count = write_results(resolve(results, products), out, args.format)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(paths)} images, {count} result rows", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
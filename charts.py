@@ -0,0 +1,108 @@
+"""
+@file charts.py
+@brief persistent matplotlib charts for the analytics dashboard. Figures are
+created once (without pyplot, so nothing is kept in pyplot's figure registry)
+and updated in place on every refresh.
+"""
+import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+
+BG_COLOR = '#2b2b2b'
+
+class RevenueChart:
+    """
+    @brief revenue bar chart, bars are reused while the bucket count stays the same
+    """
+    def __init__(self, figsize=(5, 3), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.figure.patch.set_facecolor(BG_COLOR)
+        self.ax = self.figure.add_subplot()
+        self.ax.set_facecolor(BG_COLOR)
+        self.bars = None
+
+        #style
+        self.ax.tick_params(axis='x', colors="white", rotation=45, labelsize=8)
+        self.ax.tick_params(axis='y', colors="white", labelsize=8)
+        self.ax.xaxis_date()
+
+        #border
+        self.ax.spines["bottom"].set_color("white")
+        for spine in ("top", "right", "left"):
+            self.ax.spines[spine].set_visible(False)
+
+    def update(self, dates, revenues, mode="Day"):
+        """
+        @brief show a new revenue series
+        @param dates list of datetime bucket starts
+        @param revenues list of revenue per bucket
+        @param mode "Day" or "Month", sets bar width and title
+        """
+        width = 0.8 if mode == "Day" else 20
+        x = mdates.date2num(dates) if dates else []
+
+        if self.bars is not None and len(self.bars) == len(x):
+            for rect, left, height in zip(self.bars, x, revenues):
+                rect.set_x(left - width / 2)
+                rect.set_width(width)
+                rect.set_height(height)
+        else:
+            if self.bars is not None:
+                self.bars.remove()
+            self.bars = self.ax.bar(x, revenues, color="#ff0000", alpha=0.8, width=width, label="Actual")
+            self.ax.legend(loc="upper left", fontsize=8, facecolor=BG_COLOR, edgecolor='white', labelcolor='white')
+
+        self.ax.set_title("daily revenue" if mode == "Day" else "monthly revenue", color="white", fontsize=10)
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.figure.tight_layout()
+
+    def clear(self):
+        """
+        @brief remove the bars, keep the figure
+        """
+        if self.bars is not None:
+            self.bars.remove()
+            self.bars = None
+            legend = self.ax.get_legend()
+            if legend is not None:
+                legend.remove()
+
+    def close(self):
+        self.clear()
+        self.figure.clear()
+
+
+class CategoryChart:
+    """
+    @brief donut chart of revenue per category, drawn on the same axes every refresh
+    """
+    def __init__(self, figsize=(4, 3), dpi=100):
+        self.figure = Figure(figsize=figsize, dpi=dpi)
+        self.figure.patch.set_facecolor(BG_COLOR)
+        self.ax = self.figure.add_subplot()
+        self.artists = []
+
+    def update(self, cat_counts):
+        """
+        @param cat_counts dict {category: revenue}
+        """
+        self.clear()
+        if not cat_counts:
+            return
+        wedges, texts, autotexts = self.ax.pie(
+            list(cat_counts.values()), labels=list(cat_counts.keys()), autopct='%1.1f%%', startangle=90,
+            textprops={'color': "white", 'fontsize': 8}, pctdistance=0.85,
+            wedgeprops=dict(width=0.5))
+        self.artists = [*wedges, *texts, *autotexts]
+        self.ax.set_title("Sales by Category", color="white", fontsize=10)
+        self.figure.tight_layout()
+
+    def clear(self):
+        for artist in self.artists:
+            artist.remove()
+        self.artists = []
+        self.ax.set_title("")
+
+    def close(self):
+        self.clear()
+        self.figure.clear()
@@ -24,14 +24,24 @@ def filter_data_by_date(data, start_str, end_str):
     start_date = parse_date(start_str) if start_str else datetime.min
     end_date = parse_date(end_str) + timedelta(days=1) if end_str else datetime.max
 
-    print([row for row in data if (start_date <= row['timestamp'] and row['timestamp'] <= end_date)])
     return [row for row in data if (start_date <= row['timestamp'] and row['timestamp'] <= end_date)]
 
-def get_stats(data, product_map):
-    """@brief calculates total revenue, quantity, and top category"""
-    if not data:
-        return 0, 0, "-"
+def iter_rows(chunks):
+    """
+    @brief history rows as dicts, one chunk materialized at a time
+    @param chunks iterable of DataFrames, e.g. HistoryStore.iter_chunks()
+    """
+    for chunk in chunks:
+        timestamps = chunk['timestamp'].dt.to_pydatetime()
+        for row, ts in zip(chunk.drop(columns='timestamp').to_dict('records'), timestamps):
+            row['timestamp'] = ts
+            yield row
 
+def get_stats(data, product_map):
+    """
+    @brief calculates total revenue, quantity, and top category
+    @param data list or stream (iter_rows) of row dicts
+    """
     total_revenue = 0
     total_qty = 0
     cat_counts = {}
@@ -46,6 +56,9 @@ def get_stats(data, product_map):
         
         cat_counts[cat] = cat_counts.get(cat, 0) + row['total']
 
+    if not cat_counts:
+        return 0, 0, "-"
+
     #top cat by revenue
     top_cat = new_max(cat_counts, key=cat_counts.get)
     
@@ -60,6 +73,8 @@ def group_by_time(data, mode="Day"):
     for row in data:
         ts = row['timestamp']
         k = ts.replace(hour = 0, minute = 0, second = 0, microsecond=0)
+        if mode == "Month":
+            k = k.replace(day = 1)
         grouped[k] = grouped.get(k, 0) + row['total']
 
     sorted_keys = new_sort(grouped.keys())
@@ -96,19 +111,53 @@ def group_hierarchy(data):
     return tree_data
 
 def new_sort(iterable, *, key=None):
+    """
+    @brief stable merge sort, O(n log n)
+    @param iterable items to sort
+    @param key optional key function, computed once per item
+    """
     result = list(iterable)
 
     if key is None:
         def key(x): return x
-    
+
     n = len(result)
-    for i in range(n):
-        for j in range(0, n - i - 1):
-            if (key(result[j]) > key(result[j+1])):
-                result[j], result[j+1] = result[j+1], result[j]
-    return result
+    if n < 2:
+        return result
+
+    # already sorted input (the usual case for time ordered history) costs O(n)
+    keys = [key(x) for x in result]
+    if all(keys[i] <= keys[i + 1] for i in range(n - 1)):
+        return result
+
+    # bottom up merge of (key, item) runs
+    src = list(zip(keys, result))
+    dst = [None] * n
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                # take from the right run only when strictly smaller to keep it stable
+                if src[j][0] < src[i][0]:
+                    dst[k] = src[j]
+                    j += 1
+                else:
+                    dst[k] = src[i]
+                    i += 1
+                k += 1
+            dst[k:hi] = src[i:mid] if i < mid else src[j:hi]
+        src, dst = dst, src
+        width *= 2
+
+    return [item for _, item in src]
 
 def new_max(iterable, key=None):
+    """
+    @brief single pass max, O(n), first of equal items wins
+    """
     iterator = iter(iterable)
 
     best = next(iterator)
@@ -1,112 +1,472 @@
 """
 @file data_manager.py
-@brief handle data and integration between csv storage and segment tree.
+@brief handle data and integration between history storage, the product store and segment tree.
 """
 
 import pandas as pd
 import os
-from segment_tree import SegmentTree
+import sqlite3
+import threading
+from collections import OrderedDict
+import instrument
+from segment_tree import SalesTree
+from product_store import ProductStore, PRODUCT_COLUMNS
+from rollup import RollupTables, dashboard_from_products
+from history_store import CHUNK_ROWS, HISTORY_COLUMNS, open_history_store
+from sqlite_store import SqliteHistoryStore
+
+# bulk imports larger than this rebuild the prefix indexes instead of patching them
+BULK_REINDEX = 256
+
+def validate_products(source):
+    """
+    @brief normalize bulk product input and flag invalid rows
+    @param source CSV path, DataFrame or iterable of dicts
+    @return DataFrame with PRODUCT_COLUMNS and an error column (None when valid),
+    indexed by input position
+    """
+    if isinstance(source, str):
+        try:
+            df = pd.read_csv(source, dtype={"qr_data": str, "name": str, "category": str})
+        except pd.errors.EmptyDataError:
+            df = pd.DataFrame()
+    elif isinstance(source, pd.DataFrame):
+        df = source.copy()
+    else:
+        df = pd.DataFrame(list(source))
+    if df.empty and not len(df.columns):
+        # nothing to import, not a file with the wrong columns
+        df = pd.DataFrame(columns=PRODUCT_COLUMNS)
+    missing = [col for col in ("name", "price", "qr_data") if col not in df]
+    if missing:
+        raise ValueError(f"product import needs columns {', '.join(missing)}")
+    if "category" not in df:
+        df["category"] = None
+    df = df[PRODUCT_COLUMNS].reset_index(drop=True)
+
+    df['name'] = df['name'].where(df['name'].notna(), "").astype(str).str.strip()
+    df['qr_data'] = df['qr_data'].where(df['qr_data'].notna(), "").astype(str).str.strip()
+    df['category'] = df['category'].where(df['category'].notna(), "").astype(str).str.strip()
+    df['category'] = df['category'].mask(df['category'] == "", "Uncategorized")
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+
+    error = pd.Series(None, index=df.index, dtype=object)
+    error = error.mask(df['price'].isna() | (df['price'] < 0), "price must be a number >= 0")
+    error = error.mask(df['qr_data'] == "", "qr_data is empty")
+    error = error.mask(df['name'] == "", "name is empty")
+    return df.assign(error=error)
+
 
 class DataManager:
     """
     @class DataManager
-    @brief controll csv data and the in memory segment tree.
+    @brief controll csv data, the product store and the in memory segment tree.
     """
 
-    def __init__(self, products_file="products.csv", history_file="sales_history.csv"):
+    def __init__(self, products_file="products.csv", history_file="sales_history.csv",
+                 fsync_every=8, dashboard_cache_size=32):
         """
         @brief contructor
         @param products_file path to product inventory csv
-        @param history_file path to sales sales history csv.
+        @param history_file path to sales sales history csv, a columnar history directory
+        or a SQLite database (*.db) holding both products and sales
+        @param fsync_every number of checkouts grouped into one fsync of the history file
+        @param dashboard_cache_size number of dashboard results memoized for the current data version
         """
         self.products_file = products_file
         self.history_file = history_file
-        
-        # init Segment Tree with capacity for 1000 items
-        # self.seg_tree = SegmentTree(1000) 
-        
-        # load data and push it to segment tree
-        self.df_products = self.load_products()
-        self.df_history = self.load_history()
-        # self.rebuild_segment_tree()
+        self.fsync_every = fsync_every
+
+        # write state: products are only rewritten when dirty, history is append only
+        self._products_dirty = False
+        self.history_store = open_history_store(history_file, fsync_every)
+        # shared database: products and analytics are read from SQL, not from local state
+        self.database = self.history_store if isinstance(self.history_store, SqliteHistoryStore) else None
+        # checkouts run on the Tk thread while the analytics worker reads the rollups
+        self._lock = threading.RLock()
+        # functions called as fn(seq, rows) after every checkout
+        self._listeners = []
+        # bumped by catalog changes that can move sales to another category
+        self.catalog_seq = 0
+        # (start, end, mode, version) -> dashboard result, LRU, emptied when the version moves
+        self.dashboard_cache_size = dashboard_cache_size
+        self._dashboard_cache = OrderedDict()
+        self._cache_version = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # load products, stream the history into the segment tree, the history itself stays on disk
+        self.products = ProductStore.from_dataframe(self.load_products())
+        self.sales_tree = None
+        self.rollups = None
+        # first/last sale timestamp strings, kept up to date on checkout
+        self._first_timestamp = self._last_timestamp = None
+        # sale sequence number, one per history row, only ever increases
+        self.sale_seq = 0
+        if self.database is None:
+            self.rollups = RollupTables(self.history_file)
+            if not self._load_from_manifest():
+                self.sale_seq = self._scan_history()
+                if not self.rollups.load(self.sale_seq):
+                    self.rebuild_rollups()
+
+    def history_bounds(self):
+        """
+        @brief first and last sale timestamp in O(1), tracked since the startup scan
+        @return (first, last) timestamp strings or (None, None)
+        """
+        if self.database is not None:
+            return self.database.bounds()
+        return self._first_timestamp, self._last_timestamp
 
     def load_products(self):
         """
-        @brief load product CSV.
+        @brief load product CSV, or the products table of the database.
+        An empty database table is filled from products_file first.
         @return pd.DataFrame
         """
+        if self.database is not None:
+            df = self.database.load_products()
+            if df.empty and os.path.exists(self.products_file):
+                self.database.insert_products(pd.read_csv(self.products_file))
+                df = self.database.load_products()
+            return df
         if os.path.exists(self.products_file):
             return pd.read_csv(self.products_file)
-        return pd.DataFrame(columns=["name", "price", "category", "qr_data"])
+        return pd.DataFrame(columns=PRODUCT_COLUMNS)
 
-    def load_history(self):
+    def iter_history(self, start_date=None, end_date=None, chunksize=CHUNK_ROWS):
         """
-        @brief load history CSV.
-        @return pd.DataFrame
+        @brief stream the sales history from its store in typed chunks, filtered to a day range
+        at read time. Rows are in file order, peak memory is about one chunk.
+        @param start_date first day (date) or None
+        @param end_date last day (date, inclusive) or None
+        @return generator of DataFrames with HISTORY_COLUMNS, timestamp as datetime64
+        """
+        return self.history_store.iter_chunks(start_date, end_date, chunksize)
+
+    def _scan_history(self):
+        """
+        @brief build the segment tree in one stream over the history, noting the first and
+        last sale on the way
+        @return number of history rows
+        """
+        rows = 0
+        def counted(chunks):
+            nonlocal rows
+            for chunk in chunks:
+                rows += len(chunk)
+                self._note_timestamps(str(chunk['timestamp'].min()), str(chunk['timestamp'].max()))
+                yield chunk
+        self.sales_tree = SalesTree.from_chunks(counted(self.iter_history()))
+        return rows
+
+    def _load_from_manifest(self):
+        """
+        @brief start without reading the history when the store keeps a manifest (.parts):
+        row count and first/last sale come from it, the per day totals from the saved daily rollup
+        @return True when loaded, False when the history has to be streamed
+        """
+        if not hasattr(self.history_store, "row_count"):
+            return False
+        rows = self.history_store.row_count()
+        if not self.rollups.load(rows):
+            return False
+        self.sale_seq = rows
+        self._first_timestamp, self._last_timestamp = self.history_store.bounds()
+        self.sales_tree = SalesTree.from_history(self.rollups.frame("daily"))
+        return True
+
+    def _note_timestamps(self, first, last):
+        # typed chunks hold Timestamps, str() gives the same text as the csv
+        if self._first_timestamp is None or first < self._first_timestamp:
+            self._first_timestamp = first
+        if self._last_timestamp is None or last > self._last_timestamp:
+            self._last_timestamp = last
+
+    def rebuild_segment_tree(self):
+        """
+        @brief rebuild the per day revenue/qty segment tree from the sales history
+        """
+        self.sales_tree = SalesTree.from_chunks(self.iter_history())
+
+    def rebuild_rollups(self):
+        """
+        @brief recompute the daily/monthly rollup tables from the streamed history and save them
+        """
+        with self._lock:
+            self.rollups.rebuild(self.iter_history())
+            self.rollups.save()
+
+    def dashboard_data(self, start_date=None, end_date=None, mode="Day"):
+        """
+        @brief analytics for a day range, memoized until the next sale or catalog change
+        @param start_date first day (date) or None
+        @param end_date last day (date, inclusive) or None
+        @param mode "Day" or "Month" revenue series
+        @return dict with stats, series, categories, hierarchy and the data_version it covers,
+        shared with the cache so callers must not modify it
+        """
+        version = self.data_version()
+        key = (start_date, end_date, mode, version)
+        with self._lock:
+            data = self._cached_dashboard(key, count_miss=True)
+        if data is not None:
+            return data
+
+        # computed without the lock, checkouts and cache lookups on the Tk thread go on meanwhile
+        data = self._compute_dashboard(start_date, end_date, mode, version)
+        with self._lock:
+            # a result for an older version is returned but not cached
+            if version == self._cache_version:
+                self._dashboard_cache[key] = data
+                while len(self._dashboard_cache) > self.dashboard_cache_size:
+                    self._dashboard_cache.popitem(last=False)
+        return data
+
+    def cached_dashboard(self, start_date=None, end_date=None, mode="Day"):
+        """
+        @brief memoized dashboard_data result for the current data version, without computing
+        @return dict or None
         """
-        if os.path.exists(self.history_file):
-            return pd.read_csv(self.history_file)
-        return pd.DataFrame(columns=["product_name", "price", "qty", "total", "timestamp"])
+        key = (start_date, end_date, mode, self.data_version())
+        with self._lock:
+            return self._cached_dashboard(key, count_miss=False)
 
-    # def rebuild_segment_tree(self):
-    #     """
-    #     @brief repopulates segmen tree based on current dataframe rows
-    #     """
-    #     self.seg_tree = SegmentTree(1000)
-    #     for idx, row in self.df_products.iterrows():
-    #         self.seg_tree.update_value(idx, row['price'], row['name'])
+    def _cached_dashboard(self, key, count_miss):
+        version = key[3]
+        if version != self._cache_version:
+            # every entry was computed for an older version
+            self._dashboard_cache.clear()
+            self._cache_version = version
+        data = self._dashboard_cache.get(key)
+        if data is not None:
+            self._dashboard_cache.move_to_end(key)
+            self.cache_hits += 1
+            instrument.count("analytics.cache_hit")
+        elif count_miss:
+            self.cache_misses += 1
+            instrument.count("analytics.cache_miss")
+        return data
+
+    @instrument.timed("analytics.compute")
+    def _compute_dashboard(self, start_date, end_date, mode, version):
+        if self.database is not None:
+            data = dashboard_from_products(self.database.product_daily(start_date, end_date), mode)
+            data["version"] = version
+            return data
+
+        # the rollups and the tree change on checkout, read them in one consistent step
+        with self._lock:
+            data = self.rollups.dashboard(start_date, end_date, mode, self.products.category_map())
+            # range totals from the segment tree in O(log n)
+            total_rev, total_qty = self.sales_totals(start_date, end_date)
+        data["version"] = version
+        data["stats"] = (total_rev, total_qty, data["stats"][2])
+        return data
+
+    def sales_totals(self, start_date=None, end_date=None):
+        """
+        @brief revenue and quantity sold in a day range in O(log n)
+        @param start_date first day (date) or None
+        @param end_date last day (date, inclusive) or None
+        @return (revenue, qty)
+        """
+        if self.database is not None:
+            return self.database.sales_totals(start_date, end_date)
+        return self.sales_tree.range_sum(start_date, end_date)
+
+    def data_version(self):
+        """
+        @brief changes whenever a sale is recorded or the catalog changes, by any terminal
+        when using a database
+        """
+        if self.database is not None:
+            return self.database.version(), self.database.change_count(), self.catalog_seq
+        return self.sale_seq, self.catalog_seq
+
+    def subscribe(self, listener):
+        """
+        @brief get notified of new sales
+        @param listener function (seq, rows), seq is sale_seq after the checkout and
+        rows the new history rows; called on the thread that records the sale
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
 
     def add_product(self, name, price, category, qr_data):
         """
-        @brief add a new product to the DataFrame and updates segment tree
+        @brief add a new product to the product store
         @param name product name.
         @param price pdocut price.
         @param category product category.
         @param qr_data product qr_code string
+        @throws ValueError if another product already uses qr_data
+        @return row id of the new product
         """
-        new_row = {"name": name, "price": price, "category": category, "qr_data": qr_data}
-        self.df_products = pd.concat([self.df_products, pd.DataFrame([new_row])], ignore_index=True)
-        
-        idx = len(self.df_products) - 1
-        # self.seg_tree.update_value(idx, price, name)
-        
+        if self.products.has_qr(qr_data):
+            raise ValueError(f"QR code {qr_data} is already used by another product")
+        if self.database is not None:
+            try:
+                self.database.add_product(name, price, category, qr_data)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"QR code {qr_data} is already used by another product")
+
+        with self._lock:
+            row = self.products.append(name, price, category, qr_data)
+            self.catalog_seq += 1
+        self._products_dirty = self.database is None
         self.save_data()
+        return row
 
     def delete_product_by_name(self, name):
         """
-        @brief delete product by name and rebuilds the tree
+        @brief delete product by name
         @param name name of product to delete
+        @return list of deleted row ids
+        """
+        return self.delete_products_by_names([name])
+
+    def delete_products_by_names(self, names):
+        """
+        @brief delete every product with one of the names, one persistence write
+        @param names iterable of product names
+        @return list of deleted row ids
         """
-        self.df_products = self.df_products[self.df_products['name'] != name]
+        names = list(dict.fromkeys(names))
+        rows = [row for name in names for row in self.products.rows_by_name(name)]
+        if self.database is not None:
+            self.database.delete_products_by_names(names)
+        if rows:
+            with self._lock:
+                self.products.delete_rows(rows)
+                self.catalog_seq += 1
+            self._products_dirty = self.database is None
 
-        # self.rebuild_segment_tree() 
         self.save_data()
+        return rows
 
+    def import_products(self, source):
+        """
+        @brief bulk insert/update products keyed on qr_data, one persistence write
+        @param source CSV path, DataFrame or iterable of dicts with PRODUCT_COLUMNS
+        (category may be missing)
+        @return dict with inserted, updated, unchanged and rejected counts, and errors
+        as a list of (input position, reason) for the rejected rows
+        """
+        df = validate_products(source)
+        errors = list(df.loc[df['error'].notna(), 'error'].items())
+        valid = df[df['error'].isna()]
+
+        # last row wins for a QR code repeated in the input
+        dup = valid['qr_data'].duplicated(keep='last')
+        errors += [(i, "duplicate qr_data, a later row replaces it") for i in valid.index[dup]]
+        valid = valid[~dup]
+
+        rows = valid['qr_data'].map(self.products.find_by_qr)
+        existing = valid[rows.notna()]
+        new = valid[rows.isna()]
+        existing_rows = rows[rows.notna()].astype(int)
+
+        # compare against the current values to skip rows that did not change
+        current = pd.DataFrame(
+            [(self.products.names[r], self.products.prices[r], self.products.value("category", r))
+             for r in existing_rows], columns=["name", "price", "category"], index=existing.index)
+        changed = ((current['name'] != existing['name']) | (current['price'] != existing['price'])
+                   | (current['category'] != existing['category']))
+        updates = existing[changed]
+
+        if self.database is not None:
+            self.database.upsert_products(pd.concat([updates, new]))
+        with self._lock:
+            if len(updates) + len(new) > BULK_REINDEX:
+                # one sort on the next search beats an insort per row
+                self.products.drop_prefix()
+            for row, name, price, category in zip(existing_rows[changed], updates['name'],
+                                                  updates['price'], updates['category']):
+                self.products.update_row(row, name, price, category)
+            self.products.extend(new['name'], new['price'], new['category'], new['qr_data'])
+            # price only updates leave the dashboard as it is
+            if len(new) or (current['name'] != existing['name'])[changed].any() \
+                    or (current['category'] != existing['category'])[changed].any():
+                self.catalog_seq += 1
+
+        if len(updates) or len(new):
+            self._products_dirty = self.database is None
+            self.save_data()
+
+        errors.sort()
+        return {
+            "inserted": len(new),
+            "updated": len(updates),
+            "unchanged": len(existing) - len(updates),
+            "rejected": len(errors),
+            "errors": errors,
+        }
+
+    @instrument.timed("data.find_product_by_qr")
     def find_product_by_qr(self, qr_data):
         """
         @brief search a product by its QR string
         @param qr_data scanned string
-        @return DataFrame Row or None
+        @return ProductRecord or None
         """
-        product = self.df_products[self.df_products['qr_data'] == qr_data]
-        if not product.empty:
-            return product.iloc[0]
-        return None
+        row = self.products.find_by_qr(qr_data)
+        if row is None and self.database is not None:
+            # added by another terminal since this one started
+            found = self.database.find_product_by_qr(qr_data)
+            if found is not None:
+                with self._lock:
+                    row = self.products.append(*found)
+        if row is None:
+            return None
+        return self.products.get(row)
 
+    @instrument.timed("data.record_transaction")
     def record_transaction(self, cart_items):
         """
-        @brief store a list of cart items to the history csv
+        @brief append a list of cart items to the sales history
         @param cart_items list of dictionaries representing the cart
         @return total revenue of the transaction
         """
-        new_sales = pd.DataFrame(cart_items)
-        self.df_history = pd.concat([self.df_history, new_sales], ignore_index=True)
-        self.save_data()
+        rows = [{col: item[col] for col in HISTORY_COLUMNS} for item in cart_items]
+        # one transaction per cart in the database
+        self.history_store.append(rows)
+        with self._lock:
+            if self.database is None:
+                for row in rows:
+                    self.sales_tree.add_sale(row['timestamp'], row['total'], row['qty'])
+                self.rollups.add_sales(rows)
+            self.sale_seq += len(rows)
+            seq = self.sale_seq
+            if rows:
+                stamps = [str(row['timestamp']) for row in rows]
+                self._note_timestamps(min(stamps), max(stamps))
+
+        for listener in list(self._listeners):
+            listener(seq, rows)
+
         return sum(item['total'] for item in cart_items)
 
+    @instrument.timed("data.save_data")
     def save_data(self):
         """
-        @brief writes dataframe to csv
+        @brief writes dirty product data to csv and syncs the history log.
+        With a database every change is already committed.
         """
-        self.df_products.to_csv(self.products_file, index=False)
-        self.df_history.to_csv(self.history_file, index=False)
\ No newline at end of file
+        if self._products_dirty:
+            self.products.to_dataframe().to_csv(self.products_file, index=False)
+            self._products_dirty = False
+        self.history_store.sync()
+        if self.rollups is not None and self.rollups.dirty:
+            self.rollups.save()
+
+    def close(self):
+        """
+        @brief flush pending writes and release the history file
+        """
+        self.save_data()
+        self.history_store.close()
@@ -0,0 +1,163 @@
+"""
+@file frame_source.py
+@brief frame sources for the scanner: live camera, video file, image directory
+and a synthetic generator. Every source has read() -> (ok, frame) and release(),
+the same interface as cv2.VideoCapture.
+"""
+import os
+import time
+
+import cv2
+import numpy as np
+
+class FrameSource:
+    """
+    @brief base class, optional fps pacing so file sources behave like a camera
+    """
+    def __init__(self, fps=None):
+        self.fps = fps
+        self._next_t = None
+
+    def _pace(self):
+        if not self.fps:
+            return
+        now = time.perf_counter()
+        if self._next_t is None:
+            self._next_t = now
+        self._next_t += 1 / self.fps
+        delay = self._next_t - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def read(self):
+        raise NotImplementedError
+
+    def release(self):
+        pass
+
+
+class CameraSource(FrameSource):
+    """
+    @brief live camera through cv2.VideoCapture
+    """
+    def __init__(self, index=0):
+        super().__init__()
+        self.cap = cv2.VideoCapture(index)
+
+    def read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """
+    @brief frames from a video file, optionally looped and paced to fps
+    """
+    def __init__(self, path, fps=None, loop=False):
+        super().__init__(fps)
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+
+    def read(self):
+        self._pace()
+        ok, frame = self.cap.read()
+        if not ok and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.cap.read()
+        return ok, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """
+    @brief replay the images of a directory (e.g. qrcodes/), each one for `hold` frames
+    """
+    def __init__(self, path, fps=None, loop=True, hold=1, extensions=(".png", ".jpg", ".jpeg", ".bmp")):
+        super().__init__(fps)
+        self.paths = [os.path.join(path, f) for f in sorted(os.listdir(path)) if f.lower().endswith(extensions)]
+        self.loop = loop
+        self.hold = max(1, hold)
+        self._cache = {}
+        self.index = 0
+
+    def read(self):
+        self._pace()
+        if not self.paths:
+            return False, None
+        i = self.index // self.hold
+        if i >= len(self.paths):
+            if not self.loop:
+                return False, None
+            self.index = 0
+            i = 0
+        self.index += 1
+        path = self.paths[i]
+        if path not in self._cache:
+            self._cache[path] = cv2.imread(path)
+        return True, self._cache[path]
+
+
+class SyntheticSource(FrameSource):
+    """
+    @brief camera like frames: QR images pasted on a background with jitter and
+    optional noise. Seeded, so runs are reproducible.
+    """
+    def __init__(self, image_dir="qrcodes", fps=30, size=(1280, 720), hold=15, noise=0.0, seed=0, count=None):
+        super().__init__(fps)
+        self.width, self.height = size
+        self.hold = max(1, hold)
+        self.noise = noise
+        self.count = count
+        self.rng = np.random.default_rng(seed)
+        self.images = [cv2.imread(os.path.join(image_dir, f))
+                       for f in sorted(os.listdir(image_dir)) if f.lower().endswith(".png")]
+        self.produced = 0
+        self._placement = None
+
+    def _place(self):
+        img = self.images[int(self.rng.integers(len(self.images)))]
+        side = int(self.rng.integers(min(self.height // 4, 180), min(self.height, 420) + 1))
+        qr = cv2.resize(img, (side, side), interpolation=cv2.INTER_AREA)
+        x = int(self.rng.integers(0, self.width - side + 1))
+        y = int(self.rng.integers(0, self.height - side + 1))
+        return qr, x, y
+
+    def read(self):
+        if self.count is not None and self.produced >= self.count:
+            return False, None
+        self._pace()
+        if self.produced % self.hold == 0:
+            self._placement = self._place()
+        self.produced += 1
+
+        qr, x, y = self._placement
+        side = qr.shape[0]
+        frame = np.full((self.height, self.width, 3), 190, dtype=np.uint8)
+        x = int(np.clip(x + self.rng.integers(-6, 7), 0, self.width - side))
+        y = int(np.clip(y + self.rng.integers(-6, 7), 0, self.height - side))
+        frame[y:y + side, x:x + side] = qr
+        if self.noise:
+            frame = np.clip(frame + self.rng.normal(0, self.noise, frame.shape), 0, 255).astype(np.uint8)
+        return True, frame
+
+
+def open_source(spec="camera:0", fps=None):
+    """
+    @brief build a frame source from a spec string
+    camera:<index>, video:<path>, dir:<path>, synthetic[:<image dir>]
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "camera":
+        return CameraSource(int(arg or 0))
+    if kind == "video":
+        return VideoFileSource(arg, fps=fps, loop=True)
+    if kind == "dir":
+        return ImageDirectorySource(arg or "qrcodes", fps=fps or 30, hold=15)
+    if kind == "synthetic":
+        return SyntheticSource(arg or "qrcodes", fps=fps or 30)
+    raise ValueError(f"unknown frame source {spec}")
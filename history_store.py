@@ -0,0 +1,656 @@
+"""
+@file history_store.py
+@brief storage backends for the sales history: the original CSV file, a
+directory of monthly CSV partitions, a columnar binary directory with one
+memory-mapped file per column and a SQLite database (sqlite_store.py).
+usage: python history_store.py {migrate,export} <source> <target>
+converts a history between formats, chosen by the path like open_history_store.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+HISTORY_COLUMNS = ["product_name", "price", "qty", "total", "timestamp"]
+# rows per chunk of iter_chunks, about 10 MB of typed columns
+CHUNK_ROWS = 262_144
+
+def open_history_store(path, fsync_every=8):
+    """
+    @brief pick the backend from the path: *.csv is a CSV file, *.parts a directory of
+    monthly partitions, *.db / *.sqlite a SQLite database, anything else a columnar directory
+    """
+    if path.endswith((".db", ".sqlite")):
+        from sqlite_store import SqliteHistoryStore
+        return SqliteHistoryStore(path, fsync_every)
+    if path.endswith(".csv"):
+        return CsvHistoryStore(path, fsync_every)
+    if path.endswith(".parts"):
+        return PartitionedHistoryStore(path, fsync_every)
+    return ColumnarHistoryStore(path, fsync_every)
+
+def day_range(start_date=None, end_date=None):
+    """
+    @brief datetime64 bounds [start, end + 1 day) of a day range, None when open
+    @param start_date first day (date) or None
+    @param end_date last day (date, inclusive) or None
+    """
+    start = None if start_date is None else np.datetime64(pd.Timestamp(start_date).normalize())
+    end = None if end_date is None else np.datetime64(pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1))
+    return start, end
+
+def _range_mask(ts, start, end):
+    """
+    @param ts datetime64 array
+    @return boolean mask of start <= ts < end, or None when every row matches
+    """
+    mask = None
+    if start is not None:
+        mask = ts >= start
+    if end is not None:
+        mask = (ts < end) if mask is None else mask & (ts < end)
+    return None if mask is None or mask.all() else mask
+
+
+def _complete_size(f):
+    """
+    @brief length of a binary file up to and including its last newline
+    """
+    size = f.seek(0, os.SEEK_END)
+    if size == 0:
+        return 0
+    f.seek(size - 1)
+    if f.read(1) == b"\n":
+        return size
+
+    # scan backwards for the end of the last complete row
+    pos = size
+    while pos > 0:
+        step = min(4096, pos)
+        pos -= step
+        f.seek(pos)
+        cut = f.read(step).rfind(b"\n")
+        if cut != -1:
+            return pos + cut + 1
+    # not even the header is complete
+    return 0
+
+class _Prefix(io.RawIOBase):
+    """
+    @brief read only view of the first size bytes of a binary file
+    """
+    def __init__(self, f, size):
+        self._f = f
+        self._left = size
+        f.seek(0)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._left)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buffer[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+class HistoryStore:
+    """
+    @brief base class, a sales history that is loaded once and then only appended to
+    """
+    def __init__(self, path, fsync_every=8):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._unsynced = 0
+
+    def load(self):
+        """
+        @return history DataFrame with HISTORY_COLUMNS, in file order
+        """
+        raise NotImplementedError
+
+    def append(self, rows):
+        """
+        @brief append sale rows, fsync every fsync_every calls
+        @param rows list of dictionaries with HISTORY_COLUMNS keys
+        """
+        self._write(rows)
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.sync()
+
+    def _write(self, rows):
+        raise NotImplementedError
+
+    def iter_chunks(self, start_date=None, end_date=None, chunksize=CHUNK_ROWS):
+        """
+        @brief stream the history in file order without loading all of it
+        @param start_date first day (date) or None
+        @param end_date last day (date, inclusive) or None
+        @param chunksize rows read per chunk, also the upper bound of a chunk's length
+        @return generator of non-empty DataFrames with HISTORY_COLUMNS, timestamp as datetime64
+        """
+        raise NotImplementedError
+
+    def sync(self):
+        """
+        @brief force appended rows to disk
+        """
+        self._unsynced = 0
+
+    def rewrite(self, df):
+        """
+        @brief replace the whole history with df
+        """
+        raise NotImplementedError
+
+    def close(self):
+        self.sync()
+
+
+class CsvHistoryStore(HistoryStore):
+    """
+    @brief the sales_history.csv file, appended through one open handle
+    """
+    def __init__(self, path, fsync_every=8):
+        super().__init__(path, fsync_every)
+        self._handle = None
+
+    def load(self):
+        """
+        @brief load the CSV, dropping a torn last line left by a crash mid append.
+        """
+        if os.path.exists(self.path):
+            self._recover()
+            return pd.read_csv(self.path)
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    def iter_chunks(self, start_date=None, end_date=None, chunksize=CHUNK_ROWS):
+        """
+        @brief read only: stops at the last complete line, a row being appended is left out
+        """
+        if not os.path.exists(self.path):
+            return
+        start, end = day_range(start_date, end_date)
+        with open(self.path, "rb") as f, pd.read_csv(_Prefix(f, _complete_size(f)), chunksize=chunksize,
+                                                      dtype={"product_name": str}) as reader:
+            for chunk in reader:
+                chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+                mask = _range_mask(chunk['timestamp'].to_numpy(), start, end)
+                if mask is not None:
+                    chunk = chunk[mask].reset_index(drop=True)
+                if len(chunk):
+                    yield chunk
+
+    def _recover(self):
+        """
+        @brief truncate the history file back to its last complete line
+        """
+        with open(self.path, "rb+") as f:
+            size = _complete_size(f)
+            if size != f.seek(0, os.SEEK_END):
+                f.truncate(size)
+
+    def _write(self, rows):
+        if self._handle is None:
+            if os.path.exists(self.path):
+                # never append after a torn line
+                self._recover()
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._handle = open(self.path, "a", newline="")
+            if new_file:
+                csv.writer(self._handle, lineterminator="\n").writerow(HISTORY_COLUMNS)
+
+        writer = csv.writer(self._handle, lineterminator="\n")
+        writer.writerows([row[col] for col in HISTORY_COLUMNS] for row in rows)
+        self._handle.flush()
+
+    def sync(self):
+        if self._handle is not None and self._unsynced:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        self._unsynced = 0
+
+    def rewrite(self, df):
+        self.close()
+        df.to_csv(self.path, index=False)
+
+    def close(self):
+        self.sync()
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+# file name of a monthly partition
+PARTITION_NAME = re.compile(r"\d{4}-\d{2}\.csv")
+
+class PartitionedHistoryStore(HistoryStore):
+    """
+    @brief history directory with one CSV per month (YYYY-MM.csv) and manifest.json
+    holding rows, first/last timestamp, revenue and qty of every partition.
+    Range reads open only the overlapping months, fully covered months are
+    answered from the manifest. The manifest is saved on sync; a partition whose
+    size differs from the recorded one is rescanned when the store is opened.
+    """
+    def __init__(self, path, fsync_every=8):
+        super().__init__(path, fsync_every)
+        self.manifest = None
+        self._repaired = False
+        self._parts = {}
+
+    def _part(self, month):
+        part = self._parts.get(month)
+        if part is None:
+            part = self._parts[month] = CsvHistoryStore(os.path.join(self.path, f"{month}.csv"))
+        return part
+
+    def _open(self, repair=True):
+        """
+        @param repair truncate torn partitions and save the manifest (load and writes),
+        reads only scan the complete rows of a changed partition
+        """
+        if self.manifest is not None and (self._repaired or not repair):
+            return
+        if repair:
+            os.makedirs(self.path, exist_ok=True)
+        elif not os.path.isdir(self.path):
+            self.manifest = {}
+            return
+        manifest_path = os.path.join(self.path, "manifest.json")
+        saved = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                saved = json.load(f)["partitions"]
+
+        self.manifest = {}
+        for name in sorted(os.listdir(self.path)):
+            # YYYY-MM.csv, the directory also holds the manifest and the rollup tables
+            if not PARTITION_NAME.fullmatch(name):
+                continue
+            month = name[:-4]
+            entry = saved.get(month)
+            if entry is None or entry["bytes"] != os.path.getsize(self._part(month).path):
+                # written after the last manifest save, or torn by a crash
+                entry = self._scan(month, repair)
+            self.manifest[month] = entry
+        self._repaired = repair
+        if repair and self.manifest != saved:
+            self._save_manifest()
+
+    def _scan(self, month, repair):
+        """
+        @brief manifest entry of a partition, read from its file
+        """
+        part = self._part(month)
+        if repair:
+            part._recover()
+        entry = {"rows": 0, "first": None, "last": None, "total": 0, "qty": 0}
+        for chunk in part.iter_chunks():
+            self._add_to_entry(entry, len(chunk), str(chunk['timestamp'].min()), str(chunk['timestamp'].max()),
+                               chunk['total'].sum().item(), chunk['qty'].sum().item())
+        entry["bytes"] = os.path.getsize(part.path)
+        return entry
+
+    @staticmethod
+    def _add_to_entry(entry, rows, first, last, total, qty):
+        entry["rows"] += rows
+        entry["first"] = first if entry["first"] is None else min(entry["first"], first)
+        entry["last"] = last if entry["last"] is None else max(entry["last"], last)
+        entry["total"] += total
+        entry["qty"] += qty
+
+    def _save_manifest(self):
+        for month, entry in self.manifest.items():
+            entry["bytes"] = os.path.getsize(self._part(month).path)
+        # write then rename, a crash leaves the old or the new manifest
+        tmp = os.path.join(self.path, "manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"partitions": self.manifest}, f, indent=1)
+        os.replace(tmp, os.path.join(self.path, "manifest.json"))
+
+    def load(self):
+        self._open()
+        frames = [self._part(month).load() for month in sorted(self.manifest)]
+        frames = [df for df in frames if len(df)]
+        if not frames:
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        return pd.concat(frames, ignore_index=True)
+
+    def _write(self, rows):
+        """
+        @brief append each row to the partition of its month, usually just the current one
+        """
+        self._open()
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(str(row['timestamp'])[:7], []).append(row)
+        for month, month_rows in by_month.items():
+            part = self._part(month)
+            part._write(month_rows)
+            part._unsynced += 1
+            entry = self.manifest.setdefault(month, {"rows": 0, "first": None, "last": None, "total": 0, "qty": 0})
+            stamps = [str(row['timestamp']) for row in month_rows]
+            self._add_to_entry(entry, len(month_rows), min(stamps), max(stamps),
+                               sum(row['total'] for row in month_rows), sum(row['qty'] for row in month_rows))
+
+    def sync(self):
+        if self._unsynced:
+            for part in self._parts.values():
+                part.sync()
+            self._save_manifest()
+        self._unsynced = 0
+
+    def _months(self, start_date, end_date):
+        """
+        @brief months overlapping a day range, each with True when the range covers all of it
+        """
+        self._open(repair=False)
+        start = None if start_date is None else str(start_date)
+        end = None if end_date is None else str(end_date + timedelta(days=1))
+        for month in sorted(self.manifest):
+            entry = self.manifest[month]
+            if not entry["rows"]:
+                continue
+            if (start is not None and entry["last"] < start) or (end is not None and entry["first"] >= end):
+                continue
+            covered = (start is None or entry["first"] >= start) and (end is None or entry["last"] < end)
+            yield month, covered
+
+    def iter_chunks(self, start_date=None, end_date=None, chunksize=CHUNK_ROWS):
+        for month, covered in self._months(start_date, end_date):
+            if covered:
+                yield from self._part(month).iter_chunks(chunksize=chunksize)
+            else:
+                yield from self._part(month).iter_chunks(start_date, end_date, chunksize)
+
+    def sales_totals(self, start_date=None, end_date=None):
+        """
+        @return (revenue, qty) between two days (inclusive), only the partial months at the
+        range edges are read
+        """
+        rev = qty = 0
+        for month, covered in self._months(start_date, end_date):
+            if covered:
+                rev += self.manifest[month]["total"]
+                qty += self.manifest[month]["qty"]
+                continue
+            for chunk in self._part(month).iter_chunks(start_date, end_date):
+                rev += chunk['total'].sum().item()
+                qty += chunk['qty'].sum().item()
+        return rev, qty
+
+    def row_count(self):
+        """
+        @return number of history rows, from the manifest
+        """
+        self._open(repair=False)
+        return sum(entry["rows"] for entry in self.manifest.values())
+
+    def bounds(self):
+        """
+        @return (first, last) timestamp strings from the manifest, or (None, None)
+        """
+        self._open(repair=False)
+        entries = [entry for entry in self.manifest.values() if entry["rows"]]
+        if not entries:
+            return None, None
+        return min(e["first"] for e in entries), max(e["last"] for e in entries)
+
+    def rewrite(self, df):
+        """
+        @brief split df into monthly partitions and rebuild the manifest
+        """
+        self.close()
+        _remove_dir(self.path)
+        os.makedirs(self.path)
+        self._parts = {}
+        self.manifest = {}
+        self._repaired = True
+        if len(df):
+            stamps = df['timestamp'].astype(str)
+            for month, part_df in df.groupby(stamps.str[:7].to_numpy(), sort=True):
+                part_df.to_csv(self._part(month).path, index=False, columns=HISTORY_COLUMNS)
+                part_stamps = stamps.loc[part_df.index]
+                self.manifest[month] = {"rows": len(part_df), "first": part_stamps.min(), "last": part_stamps.max(),
+                                        "total": part_df['total'].sum().item(), "qty": part_df['qty'].sum().item()}
+        self._save_manifest()
+
+    def close(self):
+        self.sync()
+        for part in self._parts.values():
+            part.close()
+
+
+# column -> dtype of its file in a columnar history directory
+COLUMN_DTYPES = {
+    "product_id": np.int32,
+    "price": np.float64,
+    "qty": np.int64,
+    "total": np.float64,
+    "timestamp": np.int64,
+}
+
+class ColumnarHistoryStore(HistoryStore):
+    """
+    @brief history directory with one raw little-endian file per column.
+    product names are stored once in names.txt and referenced by product_id,
+    timestamps are int64 nanoseconds, prices and totals float64 like a CSV with
+    fractional prices. Columns are read through np.memmap.
+    """
+    def __init__(self, path, fsync_every=8):
+        super().__init__(path, fsync_every)
+        self.names = []
+        self._name_ids = {}
+        self._handles = None
+        self._names_handle = None
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def load(self):
+        """
+        @brief map every column file, rows of a torn append are cut off
+        """
+        if not os.path.isdir(self.path):
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+        self._load_names()
+        return self._frame(self._map_columns(repair=True), self.names)
+
+    def _map_columns(self, repair):
+        """
+        @brief map the rows every column holds, a crash or a writer mid append leaves some longer
+        @param repair truncate the longer columns (load), streams leave the files alone
+        @return {column: memmap} with the same length each
+        """
+        n = min(os.path.getsize(self._file(f"{col}.bin")) // np.dtype(dtype).itemsize
+                for col, dtype in COLUMN_DTYPES.items())
+        columns = {}
+        for col, dtype in COLUMN_DTYPES.items():
+            path = self._file(f"{col}.bin")
+            if repair and os.path.getsize(path) != n * np.dtype(dtype).itemsize:
+                with open(path, "rb+") as f:
+                    f.truncate(n * np.dtype(dtype).itemsize)
+            columns[col] = np.memmap(path, dtype=dtype, mode="r", shape=(n,)) if n else np.empty(0, dtype)
+        return columns
+
+    @staticmethod
+    def _frame(columns, names):
+        return pd.DataFrame({
+            "product_name": pd.Categorical.from_codes(columns["product_id"], categories=names),
+            "price": _whole(columns["price"]),
+            "qty": columns["qty"],
+            "total": _whole(columns["total"]),
+            "timestamp": columns["timestamp"].view("datetime64[ns]"),
+        }, copy=False)
+
+    def iter_chunks(self, start_date=None, end_date=None, chunksize=CHUNK_ROWS):
+        """
+        @brief copy chunks out of the column maps, chunks outside the range only touch
+        their timestamp pages. Read only, safe while another process appends.
+        """
+        if not os.path.isdir(self.path):
+            return
+        # names first: every id in the mapped rows was written after its name
+        names = self._read_names()[0].decode("utf-8").splitlines()
+        columns = self._map_columns(repair=False)
+        start, end = day_range(start_date, end_date)
+        n = len(columns["timestamp"])
+        ts = columns["timestamp"].view("datetime64[ns]")
+        for lo in range(0, n, chunksize):
+            hi = min(lo + chunksize, n)
+            mask = _range_mask(ts[lo:hi], start, end)
+            if mask is None:
+                yield self._frame({col: np.array(values[lo:hi]) for col, values in columns.items()}, names)
+            elif mask.any():
+                yield self._frame({col: values[lo:hi][mask] for col, values in columns.items()}, names)
+
+    def _read_names(self):
+        """
+        @return (bytes of the complete lines of names.txt, file size)
+        """
+        with open(self._file("names.txt"), "rb") as f:
+            data = f.read()
+        # a torn last name cannot be referenced yet, ids are written after names
+        return data[:data.rfind(b"\n") + 1], len(data)
+
+    def _load_names(self):
+        data, size = self._read_names()
+        if size != len(data):
+            with open(self._file("names.txt"), "rb+") as f:
+                f.truncate(len(data))
+        self.names = data.decode("utf-8").splitlines()
+        self._name_ids = {name: i for i, name in enumerate(self.names)}
+
+    def _open(self):
+        if self._handles is not None:
+            return
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+            for col in COLUMN_DTYPES:
+                open(self._file(f"{col}.bin"), "wb").close()
+            open(self._file("names.txt"), "wb").close()
+            with open(self._file("meta.json"), "w") as f:
+                json.dump({"columns": {col: np.dtype(dtype).str for col, dtype in COLUMN_DTYPES.items()}}, f)
+        else:
+            # drop a torn append before adding rows after it
+            self._load_names()
+            self._map_columns(repair=True)
+        self._names_handle = open(self._file("names.txt"), "ab")
+        self._handles = {col: open(self._file(f"{col}.bin"), "ab") for col in COLUMN_DTYPES}
+
+    def _product_ids(self, names):
+        new_names = []
+        ids = []
+        for name in names:
+            pid = self._name_ids.get(name)
+            if pid is None:
+                pid = self._name_ids[name] = len(self.names)
+                self.names.append(name)
+                new_names.append(name)
+            ids.append(pid)
+        if new_names:
+            self._names_handle.write("".join(f"{name}\n" for name in new_names).encode("utf-8"))
+            self._names_handle.flush()
+        return ids
+
+    def _write_columns(self, product_ids, price, qty, total, timestamp_ns):
+        values = {"product_id": product_ids, "price": price, "qty": qty, "total": total, "timestamp": timestamp_ns}
+        for col, dtype in COLUMN_DTYPES.items():
+            handle = self._handles[col]
+            handle.write(np.asarray(values[col], dtype=dtype).tobytes())
+            handle.flush()
+
+    def _write(self, rows):
+        self._open()
+        self._write_columns(
+            self._product_ids(str(row['product_name']) for row in rows),
+            [row['price'] for row in rows],
+            [row['qty'] for row in rows],
+            [row['total'] for row in rows],
+            pd.to_datetime([row['timestamp'] for row in rows]).as_unit("ns").asi8)
+
+    def sync(self):
+        if self._handles is not None and self._unsynced:
+            for handle in (self._names_handle, *self._handles.values()):
+                handle.flush()
+                os.fsync(handle.fileno())
+        self._unsynced = 0
+
+    def rewrite(self, df):
+        """
+        @brief write df to a fresh directory and swap it in, one pass per column
+        """
+        self.close()
+        target = ColumnarHistoryStore(self.path + ".tmp")
+        _remove_dir(target.path)
+        target._open()
+        codes, uniques = pd.factorize(df['product_name'].astype(str))
+        ids = np.array(target._product_ids(uniques), dtype=np.int32)[codes] if len(df) else []
+        target._write_columns(ids, df['price'].to_numpy(), df['qty'].to_numpy(), df['total'].to_numpy(),
+                              pd.to_datetime(df['timestamp']).dt.as_unit("ns").to_numpy().view(np.int64))
+        target._unsynced = 1
+        target.close()
+
+        # maps of the old files stay valid after the unlink
+        _remove_dir(self.path)
+        os.rename(target.path, self.path)
+        self.names, self._name_ids = target.names, target._name_ids
+
+    def close(self):
+        self.sync()
+        if self._handles is not None:
+            for handle in (self._names_handle, *self._handles.values()):
+                handle.close()
+            self._handles = None
+            self._names_handle = None
+
+
+def _whole(values):
+    """
+    @brief int64 copy of a float column holding only whole numbers, as read_csv would type it
+    """
+    if len(values) and np.array_equal(values, np.floor(values)) and np.abs(values).max() < 2 ** 53:
+        return values.astype(np.int64)
+    return values
+
+def _remove_dir(path):
+    if os.path.isdir(path):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+        os.rmdir(path)
+
+def convert(source, target):
+    """
+    @brief copy a history from one store to another
+    @return number of rows copied
+    """
+    df = open_history_store(source).load()
+    open_history_store(target).rewrite(df)
+    return len(df)
+
+def main():
+    parser = argparse.ArgumentParser(description="convert the sales history between CSV, partitioned and columnar storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("migrate", help="CSV history -> columnar directory, or monthly partitions for a *.parts target")
+    p.add_argument("source", nargs="?", default="sales_history.csv")
+    p.add_argument("target", nargs="?", default="sales_history.cols")
+    p = sub.add_parser("export", help="columnar directory or *.parts partitions -> CSV history")
+    p.add_argument("source", nargs="?", default="sales_history.cols")
+    p.add_argument("target", nargs="?", default="sales_history.csv")
+    args = parser.parse_args()
+
+    n = convert(args.source, args.target)
+    print(f"copied {n} sales from {args.source} to {args.target}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+@file instrument.py
+@brief timers, counters and latency histograms for the hot paths.
+Disabled by default: a timed function then costs one flag check, a span is a shared no-op.
+usage: instrument.enable(), decorate with @instrument.timed("name") or
+wrap a block in `with instrument.span("name"):`, read instrument.snapshot().
+"""
+import functools
+import json
+import math
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+_metrics = {}
+_counters = {}
+
+# histogram buckets grow by 2^(1/8) (~9%) from 1 us, 256 buckets reach past an hour
+_BASE = 2 ** (1 / 8)
+_MIN_S = 1e-6
+_BUCKETS = 256
+
+class Histogram:
+    """
+    @brief fixed log-scale buckets, constant memory and ~9% percentile precision
+    """
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets = [0] * _BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        idx = 0 if seconds <= _MIN_S else min(_BUCKETS - 1, int(math.log(seconds / _MIN_S, _BASE)) + 1)
+        self.buckets[idx] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        @param q fraction in [0, 1]
+        @return upper edge of the bucket holding the q-th sample, in seconds
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for idx, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self.max, _MIN_S * _BASE ** idx)
+        return self.max
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def enabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _metrics.clear()
+        _counters.clear()
+
+def record(name, seconds):
+    """
+    @brief add one duration sample to the named histogram
+    """
+    with _lock:
+        hist = _metrics.get(name)
+        if hist is None:
+            hist = _metrics[name] = Histogram()
+        hist.add(seconds)
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def timed(name):
+    """
+    @brief decorator timing every call of a function under name
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - t0)
+        return wrapper
+    return decorator
+
+
+class _Span:
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_SPAN = _NoSpan()
+
+def span(name):
+    """
+    @brief context manager timing a block under name
+    """
+    return _Span(name) if _enabled else _NO_SPAN
+
+
+def snapshot():
+    """
+    @return {"timers": {name: {count, mean_ms, p50_ms, p99_ms, max_ms}}, "counters": {name: n}}
+    """
+    with _lock:
+        timers = {
+            name: {
+                "count": hist.count,
+                "mean_ms": hist.total / hist.count * 1000,
+                "p50_ms": hist.percentile(0.5) * 1000,
+                "p99_ms": hist.percentile(0.99) * 1000,
+                "max_ms": hist.max * 1000,
+            }
+            for name, hist in sorted(_metrics.items()) if hist.count
+        }
+        return {"timers": timers, "counters": dict(sorted(_counters.items()))}
+
+def dump_jsonl(path):
+    """
+    @brief append the current snapshot as one JSON line with a wall clock time
+    """
+    line = {"time": time.time(), **snapshot()}
+    with open(path, "a") as f:
+        f.write(json.dumps(line) + "\n")
+
+def summary(limit=None):
+    """
+    @brief one "name p50/p99 ms" line per timer, for the stats panel
+    """
+    timers = snapshot()["timers"]
+    lines = [f"{name}\n  {t['p50_ms']:.1f} / {t['p99_ms']:.1f} ms  n={t['count']}" for name, t in timers.items()]
+    return "\n".join(lines[:limit])
@@ -1,14 +1,28 @@
 """
 @file inventory_ui.py
-@brief ui for inventory page
+@brief ui for inventory page, a virtual table that only materializes the visible rows
 """
 import customtkinter as ctk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+
+# treeview column -> product store column
+COLUMNS = {"Name": "name", "Price": "price", "Category": "category", "QR": "qr_data"}
 
 class InventoryFrame(ctk.CTkFrame):
     def __init__(self, parent, data_manager):
         super().__init__(parent, corner_radius=0, fg_color="transparent")
         self.data_manager = data_manager
+
+        # virtual table state: display order of product rows and the visible window
+        self.view_rows = []
+        self.offset = 0
+        self.page_size = 20
+        # visible treeview item id -> product store row id, the item pool is reused
+        self.slot_rows = {}
+        self.selected_rows = set()
+        self.sort_column = None
+        self.sort_reverse = False
+        self._search_job = None
         
         self._create_widgets()
         self.refresh_ui()
@@ -29,14 +43,35 @@ class InventoryFrame(ctk.CTkFrame):
         
         ctk.CTkButton(input_frame, text="Add", width=60, command=self.add_product).pack(side="left", padx=5)
         ctk.CTkButton(input_frame, text="Del", width=60, fg_color="red", command=self.delete_product).pack(side="left", padx=5)
+        ctk.CTkButton(input_frame, text="Import", width=60, command=self.import_products).pack(side="left", padx=5)
+
+        # search as you type
+        search_frame = ctk.CTkFrame(self, fg_color="transparent")
+        search_frame.pack(fill="x", padx=20, pady=(0, 10))
+        self.entry_search = ctk.CTkEntry(search_frame, placeholder_text="Search name / category / QR", width=300)
+        self.entry_search.pack(side="left", padx=5)
+        self.entry_search.bind("<KeyRelease>", self._on_search)
+        self.lbl_count = ctk.CTkLabel(search_frame, text="", text_color="gray")
+        self.lbl_count.pack(side="left", padx=10)
 
-        # products table
-        self.tree_inv = ttk.Treeview(self, columns=("Name", "Price", "Category", "QR"), show="headings")
-        self.tree_inv.heading("Name", text="Name")
-        self.tree_inv.heading("Price", text="Price")
-        self.tree_inv.heading("Category", text="Category")
-        self.tree_inv.heading("QR", text="QR Data")
-        self.tree_inv.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+        # products table, rows are fed by the scrollbar instead of inserted up front
+        table_frame = ctk.CTkFrame(self, fg_color="transparent")
+        table_frame.pack(fill="both", expand=True, padx=20, pady=(0, 20))
+
+        self.tree_inv = ttk.Treeview(table_frame, columns=tuple(COLUMNS), show="headings")
+        self.tree_inv.heading("Name", text="Name", command=lambda: self.sort_by("Name"))
+        self.tree_inv.heading("Price", text="Price", command=lambda: self.sort_by("Price"))
+        self.tree_inv.heading("Category", text="Category", command=lambda: self.sort_by("Category"))
+        self.tree_inv.heading("QR", text="QR Data", command=lambda: self.sort_by("QR"))
+        self.scroll_inv = ttk.Scrollbar(table_frame, orient="vertical", command=self._on_scrollbar)
+        self.scroll_inv.pack(side="right", fill="y")
+        self.tree_inv.pack(side="left", fill="both", expand=True)
+
+        self.tree_inv.bind("<Configure>", self._on_resize)
+        self.tree_inv.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree_inv.bind("<MouseWheel>", self._on_wheel)
+        self.tree_inv.bind("<Button-4>", lambda e: self._scroll_to(self.offset - 3))
+        self.tree_inv.bind("<Button-5>", lambda e: self._scroll_to(self.offset + 3))
 
     def add_product(self):
         '''
@@ -44,36 +79,166 @@ class InventoryFrame(ctk.CTkFrame):
         '''
         try:
             price = float(self.entry_price.get())
-            self.data_manager.add_product(
+        except ValueError:
+            messagebox.showerror("Error", "Invalid Price")
+            return
+        try:
+            row = self.data_manager.add_product(
                 self.entry_name.get(), 
                 price, 
                 self.entry_cat.get(), 
                 self.entry_qr.get()
             )
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        if self.sort_column is None and not self.entry_search.get().strip():
+            # default order is insertion order, the new row just goes last
+            self.view_rows.append(row)
+            self._render()
+        else:
             self.refresh_ui()
-            
-            self.entry_name.delete(0, 'end')
-            self.entry_price.delete(0, 'end')
-        except ValueError:
-            messagebox.showerror("Error", "Invalid Price")
+        
+        self.entry_name.delete(0, 'end')
+        self.entry_price.delete(0, 'end')
 
     def delete_product(self):
         '''
         @brief delete product from inventory table
         '''
-        selected = self.tree_inv.selection()
-        if not selected:
+        if not self.selected_rows:
+            return
+        products = self.data_manager.products
+        names = {products.value("name", row) for row in self.selected_rows}
+        deleted = set(self.data_manager.delete_products_by_names(names))
+        self.selected_rows = set()
+        self.view_rows = [row for row in self.view_rows if row not in deleted]
+        self._render()
+
+    def import_products(self):
+        '''
+        @brief bulk add/update products from a CSV with name, price, category, qr_data columns
+        '''
+        path = filedialog.askopenfilename(title="Import products", filetypes=[("CSV files", "*.csv")])
+        if not path:
             return
-        for item in selected:
-            val = self.tree_inv.item(item, 'values')
-            self.data_manager.delete_product_by_name(val[0])
+        try:
+            result = self.data_manager.import_products(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", str(e))
+            return
+
+        text = f"Inserted: {result['inserted']}\nUpdated: {result['updated']}\n" \
+               f"Unchanged: {result['unchanged']}\nRejected: {result['rejected']}"
+        # header is line 1, the first product line 2
+        text += "".join(f"\n  line {i + 2}: {reason}" for i, reason in result['errors'][:10])
+        messagebox.showinfo("Import", text)
+        self.refresh_ui()
+
+    def sort_by(self, column):
+        '''
+        @brief sort by a column through the product store, clicking again reverses it
+        '''
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for name in COLUMNS:
+            arrow = (" \u25bc" if self.sort_reverse else " \u25b2") if name == column else ""
+            self.tree_inv.heading(name, text=("QR Data" if name == "QR" else name) + arrow)
+        self.offset = 0
+        self.refresh_ui()
+
+    def _on_search(self, event=None):
+        # debounce typing, rebuild once the user pauses
+        if self._search_job is not None:
+            self.after_cancel(self._search_job)
+        self._search_job = self.after(150, self._apply_search)
+
+    def _apply_search(self):
+        self._search_job = None
+        self.offset = 0
         self.refresh_ui()
 
     def refresh_ui(self):
         '''
-        @brief refresh inventory table data
+        @brief recompute the display order (sort + search) and render the visible window
+        '''
+        products = self.data_manager.products
+        text = self.entry_search.get().strip()
+        match = products.search(text) if text else None
+
+        if self.sort_column is not None:
+            rows = products.sorted_rows(COLUMNS[self.sort_column], self.sort_reverse)
+            if match is not None:
+                rows = [row for row in rows if row in match]
+        elif match is not None:
+            rows = sorted(match)
+        else:
+            rows = products.live_rows()
+
+        self.view_rows = rows
+        self._render()
+
+    def _render(self):
+        '''
+        @brief show view_rows[offset:offset + page_size] in a fixed pool of items
         '''
-        for i in self.tree_inv.get_children(): 
-            self.tree_inv.delete(i)
-        for _, row in self.data_manager.df_products.iterrows():
-            self.tree_inv.insert("", "end", values=(row['name'], row['price'], row['category'], row['qr_data']))
\ No newline at end of file
+        total = len(self.view_rows)
+        self.offset = max(0, min(self.offset, total - self.page_size))
+        window = self.view_rows[self.offset:self.offset + self.page_size]
+
+        slots = list(self.tree_inv.get_children())
+        while len(slots) < len(window):
+            slots.append(self.tree_inv.insert("", "end", values=("", "", "", "")))
+        if len(slots) > len(window):
+            self.tree_inv.delete(*slots[len(window):])
+            slots = slots[:len(window)]
+
+        products = self.data_manager.products
+        self.slot_rows = {}
+        selected = []
+        for iid, row in zip(slots, window):
+            product = products.get(row)
+            self.tree_inv.item(iid, values=(product.name, product.price, product.category, product.qr_data))
+            self.slot_rows[iid] = row
+            if row in self.selected_rows:
+                selected.append(iid)
+        self.tree_inv.selection_set(selected)
+
+        if total:
+            self.scroll_inv.set(self.offset / total, min(1.0, (self.offset + len(window)) / total))
+        else:
+            self.scroll_inv.set(0.0, 1.0)
+        self.lbl_count.configure(text=f"{total:,} products")
+
+    def _scroll_to(self, offset):
+        self.offset = offset
+        self._render()
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self._scroll_to(int(float(amount) * len(self.view_rows)))
+        elif action == "scroll":
+            step = self.page_size if unit == "pages" else 1
+            self._scroll_to(self.offset + int(amount) * step)
+
+    def _on_wheel(self, event):
+        direction = 1 if event.delta > 0 else -1
+        return self._scroll_to(self.offset - direction * 3)
+
+    def _on_resize(self, event):
+        rowheight = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        page_size = max(1, (event.height - rowheight) // rowheight)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self._render()
+
+    def _on_select(self, event=None):
+        # remember selection by product row, slots are reused while scrolling
+        visible = set(self.slot_rows.values())
+        chosen = {self.slot_rows[iid] for iid in self.tree_inv.selection() if iid in self.slot_rows}
+        self.selected_rows = (self.selected_rows - visible) | chosen
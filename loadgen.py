@@ -0,0 +1,154 @@
+"""
+@file loadgen.py
+@brief seeded synthetic catalogs and sales histories for benchmarks.
+Category mix follows the shipped products.csv, product popularity is Zipf-like,
+sales come in baskets spread over opening hours with morning and evening peaks.
+usage: python loadgen.py --products 10000 --rows 1000000 [--seed 0] [--out-dir data]
+"""
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from history_store import HISTORY_COLUMNS
+from product_store import PRODUCT_COLUMNS
+
+# category -> (share of the catalog, typical price in Rp)
+CATEGORIES = {
+    "Minuman": (19, 8_000),
+    "Makanan Ringan": (10, 12_000),
+    "Kebutuhan Rumah": (8, 25_000),
+    "Sayuran": (8, 10_000),
+    "Sembako": (7, 30_000),
+    "Perawatan Diri": (7, 20_000),
+    "Bayi": (6, 45_000),
+    "Bumbu": (6, 7_000),
+    "Buah": (5, 25_000),
+    "Olahan Beku": (5, 35_000),
+    "Sarapan": (5, 22_000),
+    "Makanan Kaleng": (3, 20_000),
+    "Roti": (3, 15_000),
+    "Daging": (2, 120_000),
+    "Dairy": (2, 25_000),
+    "Ikan": (2, 60_000),
+    "Makanan Instan": (2, 4_000),
+}
+
+# relative share of baskets per hour of day, the store is open 07:00-22:00
+HOURLY = np.array([0, 0, 0, 0, 0, 0, 0, 4, 8, 6, 5, 5, 6, 5, 4, 4, 6, 9, 10, 8, 6, 4, 0, 0], dtype=float)
+# relative share of baskets per weekday, Monday first
+WEEKDAY = np.array([1.0, 0.9, 0.9, 1.0, 1.2, 1.5, 1.4])
+
+def generate_products(n, seed=0):
+    """
+    @brief catalog of n products
+    @return DataFrame with PRODUCT_COLUMNS, unique names and QR codes
+    """
+    rng = np.random.default_rng(seed)
+    names = list(CATEGORIES)
+    share = np.array([CATEGORIES[c][0] for c in names], dtype=float)
+    typical = np.array([CATEGORIES[c][1] for c in names], dtype=float)
+
+    cat_idx = rng.choice(len(names), size=n, p=share / share.sum())
+    # prices spread log-normally around the category price, rounded to Rp 500
+    price = np.maximum(500, np.round(typical[cat_idx] * rng.lognormal(0, 0.4, n) / 500) * 500).astype(np.int64)
+    category = np.array(names, dtype=object)[cat_idx]
+    return pd.DataFrame({
+        "name": [f"{c} {i:06d}" for i, c in enumerate(category)],
+        "price": price,
+        "category": category,
+        "qr_data": [f"QR{i:08d}" for i in range(n)],
+    }, columns=PRODUCT_COLUMNS)
+
+def popularity(n, skew=0.9, seed=0):
+    """
+    @brief Zipf-like sale probability per product, in random product order
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1 / np.arange(1, n + 1) ** skew
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+def generate_history(products, n_rows, seed=0, start="2024-01-01", days=None, basket_mean=3.0):
+    """
+    @brief sales history of about n_rows rows, in timestamp order
+    @param products catalog from generate_products
+    @param days length of the history, default about 300 rows per day
+    @param basket_mean mean number of lines per checkout
+    @return DataFrame with HISTORY_COLUMNS, timestamp as "YYYY-MM-DD HH:MM:SS"
+    """
+    rng = np.random.default_rng(seed)
+    days = days or max(1, n_rows // 300)
+    start = pd.Timestamp(start)
+
+    # basket sizes first, then trim the last basket so the row count is exact
+    sizes = rng.geometric(1 / basket_mean, size=int(n_rows / basket_mean * 1.2) + 16)
+    ends = np.cumsum(sizes)
+    n_baskets = int(np.searchsorted(ends, n_rows)) + 1
+    sizes = sizes[:n_baskets]
+    sizes[-1] -= ends[n_baskets - 1] - n_rows
+
+    # basket time: weekday-weighted day, hour from the opening-hours profile, any second
+    day_index = np.arange(days)
+    day_weight = WEEKDAY[(start.dayofweek + day_index) % 7]
+    day = rng.choice(days, size=n_baskets, p=day_weight / day_weight.sum())
+    hour = rng.choice(24, size=n_baskets, p=HOURLY / HOURLY.sum())
+    second = rng.integers(0, 3600, size=n_baskets)
+    basket_ns = (start.value + day.astype(np.int64) * 86_400_000_000_000
+                 + (hour * 3600 + second).astype(np.int64) * 1_000_000_000)
+    basket_ns.sort()
+
+    item = rng.choice(len(products), size=n_rows, p=popularity(len(products), seed=seed))
+    qty = np.minimum(rng.geometric(0.6, size=n_rows), 24)
+    price = products['price'].to_numpy()[item]
+    timestamp = pd.to_datetime(np.repeat(basket_ns, sizes)).strftime("%Y-%m-%d %H:%M:%S")
+    return pd.DataFrame({
+        "product_name": products['name'].to_numpy()[item],
+        "price": price,
+        "qty": qty,
+        "total": price * qty,
+        "timestamp": timestamp,
+    }, columns=HISTORY_COLUMNS)
+
+def generate_cart(products, rng, size=None, when=None):
+    """
+    @brief one checkout like ScannerFrame builds it
+    @param rng numpy Generator
+    """
+    size = size or int(rng.geometric(1 / 3.0))
+    now = (when or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    rows = products.iloc[rng.integers(0, len(products), size=size)]
+    cart = []
+    for name, price in zip(rows['name'], rows['price'].tolist()):
+        qty = int(rng.geometric(0.6))
+        cart.append({"product_name": name, "price": price, "qty": qty, "total": price * qty, "timestamp": now})
+    return cart
+
+def write_dataset(out_dir, n_products, n_rows, seed=0):
+    """
+    @brief write products.csv and sales_history.csv into out_dir
+    @return (products path, history path)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    products = generate_products(n_products, seed)
+    prod_path = os.path.join(out_dir, "products.csv")
+    hist_path = os.path.join(out_dir, "sales_history.csv")
+    products.to_csv(prod_path, index=False)
+    generate_history(products, n_rows, seed).to_csv(hist_path, index=False)
+    return prod_path, hist_path
+
+def main():
+    parser = argparse.ArgumentParser(description="generate a synthetic catalog and sales history")
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", default="data")
+    args = parser.parse_args()
+
+    prod_path, hist_path = write_dataset(args.out_dir, args.products, args.rows, args.seed)
+    print(f"wrote {args.products} products to {prod_path} and {args.rows} sales to {hist_path}")
+
+if __name__ == "__main__":
+    main()
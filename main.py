@@ -2,41 +2,80 @@
 @file main.py
 @brief main application for the kasir app
 """
+import argparse
+import importlib
+import time
+from contextlib import contextmanager
+
 import customtkinter as ctk
-from data_manager import DataManager
 
-# import ui modules
-from inventory_ui import InventoryFrame
-from scanner_ui import ScannerFrame
-from analytic_ui import AnalyticsFrame
+import instrument
+
+# page name -> (module, frame class), modules are imported on first show:
+# scanner_ui pulls in cv2/pyzbar, analytic_ui matplotlib
+PAGES = {
+    "inventory": ("inventory_ui", "InventoryFrame"),
+    "scan": ("scanner_ui", "ScannerFrame"),
+    "stats": ("analytic_ui", "AnalyticsFrame"),
+}
+# pages each role can open
+ROLE_PAGES = {
+    "Admin": ("inventory", "scan", "stats"),
+    "User": ("scan",),
+}
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
 
 class CashierApp(ctk.CTk):
-    def __init__(self, role):
-        super().__init__()
+    def __init__(self, role, source="camera:0", history="sales_history.csv", profile_out=None):
+        # (phase, seconds) for the startup report
+        self.startup_times = []
+        with self.timed("window"):
+            super().__init__()
 
         self.role = role
+        self.source = source
+        self.profile_out = profile_out
+        self.frames = {}
 
         self.title("TUBES - CASHIER APP")
         self.geometry("1200x750")
         
         # init data
-        self.data_manager = DataManager()
+        with self.timed("import data_manager"):
+            from data_manager import DataManager
+        with self.timed("load data"):
+            self.data_manager = DataManager(history_file=history)
 
         #setup layout
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
-        self.create_sidebar()
-        self.create_pages()
+        with self.timed("sidebar"):
+            self.create_sidebar()
         
         if self.role == "Admin":
             self.show_frame("inventory")
         else:
             self.show_frame("scan")
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        if instrument.enabled():
+            self._update_profile()
+
+    def on_close(self):
+        """
+        @brief stop the camera and flush pending sales before exit
+        """
+        if "scan" in self.frames:
+            self.frames["scan"].stop_scanning()
+        self.data_manager.close()
+        if self.profile_out:
+            instrument.dump_jsonl(self.profile_out)
+        self.destroy()
+
     def create_sidebar(self):
         self.sidebar = ctk.CTkFrame(self, width=200, corner_radius=0)
         self.sidebar.grid(row=0, column=0, sticky="nsew")
@@ -50,33 +89,74 @@ class CashierApp(ctk.CTk):
         row_num = 2 if self.role == "Admin" else 1
         ctk.CTkButton(self.sidebar, text="Scan QR / CheckOut", command=lambda: self.show_frame("scan")).grid(row=row_num, column=0, padx=20, pady=10)
 
-    def create_pages(self):
-        self.frames = {}
-        
-        self.frames["inventory"] = InventoryFrame(self, self.data_manager)
-        self.frames["scan"] = ScannerFrame(self, self.data_manager)
-        self.frames["stats"] = AnalyticsFrame(self, self.data_manager)
-
-        for frame in self.frames.values():
-            frame.grid(row=0, column=1, sticky="nsew")
+        # hot path p50/p99 while profiling
+        self.lbl_profile = None
+        if instrument.enabled():
+            self.lbl_profile = ctk.CTkLabel(self.sidebar, text="", justify="left", text_color="gray", font=("Consolas", 10))
+            self.lbl_profile.grid(row=4, column=0, padx=10, pady=10, sticky="w")
+
+    def _update_profile(self, ticks=0):
+        """
+        @brief refresh the stats panel every second, append to the JSONL file every 10 s
+        """
+        self.lbl_profile.configure(text=instrument.summary(limit=8))
+        ticks += 1
+        if self.profile_out and ticks % 10 == 0:
+            instrument.dump_jsonl(self.profile_out)
+        self.after(1000, self._update_profile, ticks)
+
+    @contextmanager
+    def timed(self, phase):
+        t0 = time.perf_counter()
+        yield
+        self.startup_times.append((phase, time.perf_counter() - t0))
+
+    def get_page(self, page_name):
+        """
+        @brief the page frame, imported and built the first time it is needed
+        """
+        frame = self.frames.get(page_name)
+        if frame is None:
+            if page_name not in ROLE_PAGES[self.role]:
+                raise KeyError(f"{self.role} cannot open {page_name}")
+            module_name, class_name = PAGES[page_name]
+            with self.timed(f"import {module_name}"):
+                frame_class = getattr(importlib.import_module(module_name), class_name)
+            with self.timed(f"build {page_name}"):
+                if page_name == "scan":
+                    frame = frame_class(self, self.data_manager, self.source)
+                else:
+                    frame = frame_class(self, self.data_manager)
+                frame.grid(row=0, column=1, sticky="nsew")
+            self.frames[page_name] = frame
+        return frame
+
+    def startup_report(self):
+        """
+        @brief startup time per import and construction phase, pages report when first shown
+        """
+        lines = [f"{phase:<24} {seconds * 1000:>8.1f} ms" for phase, seconds in self.startup_times]
+        lines.append(f"{'total':<24} {sum(s for _, s in self.startup_times) * 1000:>8.1f} ms")
+        return "\n".join(lines)
 
     def show_frame(self, page_name):
         # camera handler
-        scanner = self.frames["scan"]
-        if page_name != "scan":
-            scanner.stop_scanning()
+        if page_name != "scan" and "scan" in self.frames:
+            self.frames["scan"].stop_scanning()
+        if page_name != "stats" and "stats" in self.frames:
+            self.frames["stats"].hide()
             
         # request frame
-        frame = self.frames[page_name]
+        frame = self.get_page(page_name)
         frame.tkraise()
         
         # page logic handler
         if page_name == "scan":
-            scanner.start_scanning()
+            frame.start_scanning()
         elif page_name == "stats":
-            self.frames["stats"].update_stats()
+            frame.update_stats()
 
-def start_app():
+def start_app(source="camera:0", history="sales_history.csv", report=False, profile_out=None):
     class RoleSelect(ctk.CTkToplevel):
         def __init__(self, parent):
             super().__init__(parent)
@@ -116,11 +196,29 @@ def start_app():
 
     if select.role:
         root.destroy()
-        app = CashierApp(role = select.role)
+        app = CashierApp(role = select.role, source = source, history = history, profile_out = profile_out)
+        if report:
+            app.update_idletasks()
+            print(app.startup_report())
         app.mainloop()
     else:
         root.destroy()
 
 
 if __name__ == "__main__":
-    start_app()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="cashier app")
+    parser.add_argument("--source", default="camera:0",
+                        help="frame source: camera:<index>, video:<path>, dir:<path> or synthetic[:<image dir>]")
+    parser.add_argument("--history", default="sales_history.csv",
+                        help="sales history: a .csv file, a monthly partitioned .parts directory, a SQLite .db "
+                             "shared by several terminals, or a columnar directory made by history_store.py migrate")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print startup time per import and construction phase")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the hot paths, show p50/p99 in the sidebar")
+    parser.add_argument("--profile-out", default=None,
+                        help="also append metrics snapshots to this JSONL file (implies --profile)")
+    args = parser.parse_args()
+    if args.profile or args.profile_out:
+        instrument.enable()
+    start_app(args.source, args.history, args.startup_report, args.profile_out)
\ No newline at end of file
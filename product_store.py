@@ -0,0 +1,343 @@
+"""
+@file product_store.py
+@brief column store for the product catalog, with hash and prefix indexes for lookups and search
+"""
+from array import array
+from bisect import bisect_left, insort
+import sys
+
+import pandas as pd
+
+PRODUCT_COLUMNS = ["name", "price", "category", "qr_data"]
+# columns with a sorted prefix index for search-as-you-type and sorting
+PREFIX_COLUMNS = ("name", "category", "qr_data")
+
+class ProductRecord:
+    """
+    @brief one product row, indexable like the old DataFrame row (product['name'])
+    """
+    __slots__ = ("row", "name", "price", "category", "qr_data")
+
+    def __init__(self, row, name, price, category, qr_data):
+        self.row = row
+        self.name = name
+        self.price = price
+        self.category = category
+        self.qr_data = qr_data
+
+    def __getitem__(self, key):
+        if key not in PRODUCT_COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in PRODUCT_COLUMNS else default
+
+    def to_dict(self):
+        return {col: getattr(self, col) for col in PRODUCT_COLUMNS}
+
+    def __repr__(self):
+        return f"ProductRecord({self.name!r}, {self.price!r}, {self.category!r}, {self.qr_data!r})"
+
+
+class ProductStore:
+    """
+    @brief parallel columns for the catalog: prices in an array('d'), categories as
+    ids into a small table, names and QR codes as lists of interned str. Its indexes
+    make it larger per product than a bare DataFrame, see benchmark.py memory.
+    Deleted rows are tombstoned, row ids stay stable for the UI; to_dataframe() leaves them
+    out, so they are gone from the saved catalog and after a restart.
+    """
+    def __init__(self):
+        self.prices = array('d')
+        self.category_ids = array('i')
+        self.categories = []
+        self._category_lookup = {}
+        self.names = []
+        self.qr_codes = []
+        self.alive = bytearray()
+        self.count = 0
+
+        # hash indexes: qr_data -> row, name -> rows
+        self._qr_index = {}
+        self._name_index = {}
+
+        # prefix indexes: column -> array of row ids sorted by casefolded value,
+        # built on first search and kept up to date afterwards
+        self._prefix = None
+
+    @classmethod
+    def from_dataframe(cls, df):
+        """
+        @brief build the store from a products DataFrame
+        @param df DataFrame with PRODUCT_COLUMNS
+        """
+        store = cls()
+        store.extend(df['name'], df['price'], df['category'], df['qr_data'])
+        return store
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for row in range(len(self.alive)):
+            if self.alive[row]:
+                yield self.get(row)
+
+    def _intern_category(self, category):
+        cat_id = self._category_lookup.get(category)
+        if cat_id is None:
+            cat_id = len(self.categories)
+            self.categories.append(category)
+            self._category_lookup[category] = cat_id
+        return cat_id
+
+    def append(self, name, price, category, qr_data):
+        """
+        @brief add a product row and index it
+        @return row id
+        """
+        row = len(self.alive)
+        name = sys.intern(str(name))
+        qr_data = sys.intern(str(qr_data))
+        self.prices.append(float(price))
+        self.category_ids.append(self._intern_category(category))
+        self.names.append(name)
+        self.qr_codes.append(qr_data)
+        self.alive.append(1)
+        self.count += 1
+
+        # first row wins for duplicated QR codes, same as the old mask lookup
+        self._qr_index.setdefault(qr_data, row)
+        # a plain int for unique names, a list only once a name repeats
+        prev = self._name_index.get(name)
+        if prev is None:
+            self._name_index[name] = row
+        elif isinstance(prev, list):
+            prev.append(row)
+        else:
+            self._name_index[name] = [prev, row]
+
+        if self._prefix is not None:
+            for column, rows in self._prefix.items():
+                insort(rows, row, key=self._sort_key(column))
+        return row
+
+    def extend(self, names, prices, categories, qr_codes):
+        """
+        @brief append many rows with one extend per column, then index them
+        @return range of the new row ids
+        """
+        start = len(self.alive)
+        names = [sys.intern(str(name)) for name in names]
+        qr_codes = [sys.intern(str(qr)) for qr in qr_codes]
+        self.prices.extend(float(price) for price in prices)
+        self.category_ids.extend(self._intern_category(category) for category in categories)
+        self.names.extend(names)
+        self.qr_codes.extend(qr_codes)
+        self.alive.extend(b"\x01" * len(names))
+        self.count += len(names)
+
+        rows = range(start, len(self.alive))
+        for row, qr_data in zip(rows, qr_codes):
+            self._qr_index.setdefault(qr_data, row)
+        for row in rows:
+            self._index_name(row)
+        if self._prefix is not None:
+            for column, sorted_rows in self._prefix.items():
+                key = self._sort_key(column)
+                for row in rows:
+                    insort(sorted_rows, row, key=key)
+        return rows
+
+    def delete_rows(self, rows):
+        """
+        @brief tombstone rows and drop them from the indexes
+        """
+        for row in rows:
+            if not self.alive[row]:
+                continue
+            if self._prefix is not None:
+                for column, sorted_rows in self._prefix.items():
+                    key = self._sort_key(column)
+                    i = bisect_left(sorted_rows, key(row), key=key)
+                    while sorted_rows[i] != row:
+                        i += 1
+                    del sorted_rows[i]
+            self.alive[row] = 0
+            self.count -= 1
+            qr = self.qr_codes[row]
+            if self._qr_index.get(qr) == row:
+                del self._qr_index[qr]
+            self._unindex_name(row)
+
+    def _unindex_name(self, row):
+        name = self.names[row]
+        name_rows = self.rows_by_name(name)
+        if row in name_rows:
+            name_rows.remove(row)
+            if not name_rows:
+                del self._name_index[name]
+            else:
+                self._name_index[name] = name_rows if len(name_rows) > 1 else name_rows[0]
+
+    def _index_name(self, row):
+        name = self.names[row]
+        prev = self._name_index.get(name)
+        if prev is None:
+            self._name_index[name] = row
+        elif isinstance(prev, list):
+            insort(prev, row)
+        else:
+            self._name_index[name] = sorted([prev, row])
+
+    def update_row(self, row, name, price, category):
+        """
+        @brief change a live product in place, the QR code stays its key
+        """
+        name = sys.intern(str(name))
+        changed = [column for column, old, new in (("name", self.names[row], name),
+                                                   ("category", self.categories[self.category_ids[row]], category))
+                   if old != new]
+        if self._prefix is not None:
+            for column in changed:
+                sorted_rows = self._prefix[column]
+                key = self._sort_key(column)
+                i = bisect_left(sorted_rows, key(row), key=key)
+                while sorted_rows[i] != row:
+                    i += 1
+                del sorted_rows[i]
+
+        if name != self.names[row]:
+            self._unindex_name(row)
+            self.names[row] = name
+            self._index_name(row)
+        self.prices[row] = float(price)
+        self.category_ids[row] = self._intern_category(category)
+
+        if self._prefix is not None:
+            for column in changed:
+                insort(self._prefix[column], row, key=self._sort_key(column))
+
+    def drop_prefix(self):
+        """
+        @brief forget the prefix indexes, bulk changes rebuild them once on the next search
+        """
+        self._prefix = None
+
+    def value(self, column, row):
+        """
+        @brief one cell without building a ProductRecord
+        """
+        if column == "name":
+            return self.names[row]
+        if column == "qr_data":
+            return self.qr_codes[row]
+        if column == "category":
+            return self.categories[self.category_ids[row]]
+        return self.prices[row]
+
+    def _sort_key(self, column):
+        if column == "price":
+            return self.prices.__getitem__
+        return lambda row: str(self.value(column, row)).casefold()
+
+    def _build_prefix(self):
+        live = self.live_rows()
+        self._prefix = {column: array('i', sorted(live, key=self._sort_key(column))) for column in PREFIX_COLUMNS}
+
+    def live_rows(self):
+        """
+        @brief row ids of every live product in insertion order
+        """
+        return [row for row in range(len(self.alive)) if self.alive[row]]
+
+    def search(self, text, columns=PREFIX_COLUMNS):
+        """
+        @brief rows whose name, category or QR code starts with text (case insensitive),
+        O(log n + matches) through the prefix indexes
+        @return set of row ids
+        """
+        if self._prefix is None:
+            self._build_prefix()
+        prefix = text.casefold()
+        found = set()
+        for column in columns:
+            rows = self._prefix[column]
+            key = self._sort_key(column)
+            i = bisect_left(rows, prefix, key=key)
+            while i < len(rows) and key(rows[i]).startswith(prefix):
+                found.add(rows[i])
+                i += 1
+        return found
+
+    def sorted_rows(self, column, reverse=False):
+        """
+        @brief live row ids ordered by a column
+        """
+        if column in PREFIX_COLUMNS:
+            if self._prefix is None:
+                self._build_prefix()
+            rows = list(self._prefix[column])
+        else:
+            rows = sorted(self.live_rows(), key=self._sort_key(column))
+        if reverse:
+            rows.reverse()
+        return rows
+
+    def get(self, row):
+        """
+        @brief materialize one row
+        @return ProductRecord
+        """
+        price = self.prices[row]
+        if price.is_integer():
+            price = int(price)
+        return ProductRecord(row, self.names[row], price,
+                             self.categories[self.category_ids[row]], self.qr_codes[row])
+
+    def find_by_qr(self, qr_data):
+        """@return row id or None"""
+        return self._qr_index.get(qr_data)
+
+    def rows_by_name(self, name):
+        """@return list of row ids"""
+        rows = self._name_index.get(name)
+        if rows is None:
+            return []
+        return list(rows) if isinstance(rows, list) else [rows]
+
+    def has_qr(self, qr_data):
+        return qr_data in self._qr_index
+
+    def category_of(self, name, default="Uncategorized"):
+        """
+        @brief category of the first live product with this name
+        """
+        rows = self.rows_by_name(name)
+        if not rows:
+            return default
+        return self.categories[self.category_ids[rows[0]]]
+
+    def category_map(self):
+        """
+        @brief product name -> category of the first live product with that name, the same
+        rule as category_of and SqliteHistoryStore.product_daily
+        """
+        return {name: self.categories[self.category_ids[rows if isinstance(rows, int) else rows[0]]]
+                for name, rows in self._name_index.items()}
+
+    def to_dataframe(self):
+        """
+        @brief export live rows as a DataFrame (row ids as index)
+        """
+        live = [row for row in range(len(self.alive)) if self.alive[row]]
+        prices = [self.prices[r] for r in live]
+        if all(p.is_integer() for p in prices):
+            prices = [int(p) for p in prices]
+        return pd.DataFrame({
+            "name": [self.names[r] for r in live],
+            "price": prices,
+            "category": [self.categories[self.category_ids[r]] for r in live],
+            "qr_data": [self.qr_codes[r] for r in live],
+        }, index=live, columns=PRODUCT_COLUMNS)
@@ -0,0 +1,114 @@
+"""
+@file qr_decoder.py
+@brief QR decoding strategies: grayscale, downscaled first pass, and region of
+interest tracking around the last seen code with a full frame fallback.
+"""
+import cv2
+
+def pyzbar_backend(image):
+    """
+    @brief decode with pyzbar
+    @return list of (text, (left, top, width, height))
+    """
+    from pyzbar.pyzbar import decode
+    return [(obj.data.decode('utf-8'), tuple(obj.rect)) for obj in decode(image)]
+
+_cv_detector = None
+
+def opencv_backend(image):
+    """
+    @brief decode with OpenCV's QRCodeDetector, for hosts without the zbar library
+    @return list of (text, (left, top, width, height))
+    """
+    global _cv_detector
+    if _cv_detector is None:
+        _cv_detector = cv2.QRCodeDetector()
+    text, points, _ = _cv_detector.detectAndDecode(image)
+    if not text or points is None:
+        return []
+    pts = points.reshape(-1, 2)
+    x0, y0 = pts.min(axis=0)
+    x1, y1 = pts.max(axis=0)
+    return [(text, (int(x0), int(y0), int(x1 - x0), int(y1 - y0)))]
+
+STRATEGIES = ("full", "gray", "downscale", "adaptive")
+
+class QRDecoder:
+    """
+    @brief callable frame -> list of decoded strings
+    strategies:
+        full       decode the frame as given (the old behaviour)
+        gray       decode a grayscale copy
+        downscale  grayscale, try a downscaled copy first then full resolution
+        adaptive   downscale, plus decode only the last seen bounding box on later
+                   frames and fall back to the full frame after a miss
+    """
+    def __init__(self, strategy="adaptive", backend=pyzbar_backend, scale=0.5, roi_margin=0.5):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"unknown strategy {strategy}, expected one of {STRATEGIES}")
+        self.strategy = strategy
+        self.backend = backend
+        self.scale = scale
+        self.roi_margin = roi_margin
+        self.roi = None
+
+        # attempts/hits per stage
+        self.counters = {stage: [0, 0] for stage in ("roi", "small", "full")}
+
+    def _try(self, stage, image):
+        found = self.backend(image)
+        self.counters[stage][0] += 1
+        if found:
+            self.counters[stage][1] += 1
+        return found
+
+    def _remember(self, rect, dx=0, dy=0, factor=1.0):
+        left, top, width, height = rect
+        self.roi = (int(left / factor) + dx, int(top / factor) + dy,
+                    int(width / factor), int(height / factor))
+
+    def _decode_roi(self, gray):
+        left, top, width, height = self.roi
+        mx = int(width * self.roi_margin)
+        my = int(height * self.roi_margin)
+        x0, y0 = max(left - mx, 0), max(top - my, 0)
+        x1, y1 = min(left + width + mx, gray.shape[1]), min(top + height + my, gray.shape[0])
+        if x1 <= x0 or y1 <= y0:
+            return []
+        found = self._try("roi", gray[y0:y1, x0:x1])
+        if found:
+            self._remember(found[0][1], x0, y0)
+        return found
+
+    def __call__(self, frame):
+        if self.strategy == "full":
+            return [text for text, _ in self._try("full", frame)]
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if self.strategy == "gray":
+            return [text for text, _ in self._try("full", gray)]
+
+        if self.strategy == "adaptive" and self.roi is not None:
+            found = self._decode_roi(gray)
+            if found:
+                return [text for text, _ in found]
+            # lost the code, next frames start from scratch
+            self.roi = None
+
+        if self.scale < 1.0 and min(gray.shape[:2]) * self.scale >= 64:
+            small = cv2.resize(gray, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+            found = self._try("small", small)
+            if found:
+                self._remember(found[0][1], factor=self.scale)
+                return [text for text, _ in found]
+
+        found = self._try("full", gray)
+        if found:
+            self._remember(found[0][1])
+        return [text for text, _ in found]
+
+    def hit_rates(self):
+        """
+        @return {stage: (attempts, hits)}
+        """
+        return {stage: tuple(v) for stage, v in self.counters.items()}
@@ -0,0 +1,245 @@
+"""
+@file rollup.py
+@brief pre-aggregated daily/monthly sales tables, kept up to date on checkout.
+usage: python rollup.py [--history sales_history.csv]
+rebuilds every rollup table from the raw sales history.
+"""
+import argparse
+import json
+import os
+import pandas as pd
+
+import vector_function as vf
+
+# table name -> key columns, every table also has total and qty columns
+ROLLUPS = {
+    "daily": ["timestamp"],
+    "monthly": ["timestamp"],
+    "product_daily": ["timestamp", "product_name"],
+}
+
+def _day_key(timestamp):
+    return str(timestamp)[:10]
+
+def _month_key(timestamp):
+    return str(timestamp)[:7] + "-01"
+
+class RollupTables:
+    """
+    @brief revenue/qty per day, per month and per product per day. Categories are joined
+    in at query time, so a catalog change applies to the whole history at once.
+    Tables live in memory as dicts {key tuple: [total, qty]} and are persisted as
+    <history>_<table>.csv next to a history CSV, or as rollup_<table>.csv inside a
+    history directory, so stores sharing a base name never share tables.
+    """
+    def __init__(self, history_file):
+        if history_file.endswith(".csv"):
+            base = history_file[:-4]
+            self.paths = {name: f"{base}_{name}.csv" for name in ROLLUPS}
+            self.meta_path = f"{base}_rollup.json"
+        else:
+            self.paths = {name: os.path.join(history_file, f"rollup_{name}.csv") for name in ROLLUPS}
+            self.meta_path = os.path.join(history_file, "rollup.json")
+        self.tables = {name: {} for name in ROLLUPS}
+        self.history_rows = 0
+        self.dirty = False
+        self._frames = {}
+
+    def load(self, history_rows):
+        """
+        @brief load persisted tables if they were saved for the same history
+        @param history_rows number of rows in the sales history
+        @return True when loaded, False when a rebuild is needed
+        """
+        if not os.path.exists(self.meta_path):
+            return False
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta.get("history_rows") != history_rows:
+            return False
+        if not all(os.path.exists(path) for path in self.paths.values()):
+            return False
+
+        for name, keys in ROLLUPS.items():
+            df = pd.read_csv(self.paths[name], dtype={key: str for key in keys})
+            self.tables[name] = {tuple(k): [t, q] for *k, t, q in
+                                 zip(*(df[key] for key in keys), df['total'].tolist(), df['qty'].tolist())}
+        self.history_rows = history_rows
+        self.dirty = False
+        self._frames = {}
+        return True
+
+    def save(self):
+        """
+        @brief write every table and the row count they cover. Skipped while a history
+        directory does not exist yet, the store creates it on the first sale.
+        """
+        if not os.path.isdir(os.path.dirname(self.meta_path) or "."):
+            return
+        for name, keys in ROLLUPS.items():
+            rows = [(*k, t, q) for k, (t, q) in sorted(self.tables[name].items())]
+            pd.DataFrame(rows, columns=keys + ["total", "qty"]).to_csv(self.paths[name], index=False)
+        with open(self.meta_path, "w") as f:
+            json.dump({"history_rows": self.history_rows}, f)
+        self.dirty = False
+
+    def rebuild(self, df_history):
+        """
+        @brief recompute every table from the raw sales history
+        @param df_history sales history DataFrame, or an iterable of history chunks
+        (HistoryStore.iter_chunks) that are aggregated one at a time
+        """
+        chunks = (df_history,) if isinstance(df_history, pd.DataFrame) else df_history
+        self.tables = {name: {} for name in ROLLUPS}
+        self.history_rows = 0
+        for chunk in chunks:
+            self._add_frame(vf.to_frame(chunk))
+            self.history_rows += len(chunk)
+        self.dirty = True
+        self._frames = {}
+
+    def _add_frame(self, frame):
+        """
+        @brief add the grouped totals of a history frame to every table
+        """
+        day = frame['timestamp'].dt.strftime("%Y-%m-%d")
+        month = frame['timestamp'].dt.strftime("%Y-%m-01")
+        keys = {
+            "daily": [day],
+            "monthly": [month],
+            "product_daily": [day, frame['product_name']],
+        }
+        for name, by in keys.items():
+            grouped = frame[['total', 'qty']].groupby(by, sort=True, dropna=False, observed=True).sum()
+            index = grouped.index if len(by) > 1 else [(k,) for k in grouped.index]
+            table = self.tables[name]
+            for k, t, q in zip(index, grouped['total'].tolist(), grouped['qty'].tolist()):
+                cell = table.get(tuple(k))
+                if cell is None:
+                    table[tuple(k)] = [t, q]
+                else:
+                    cell[0] += t
+                    cell[1] += q
+
+    def add_sales(self, rows):
+        """
+        @brief add new sale rows to every table
+        @param rows list of dicts with product_name, qty, total, timestamp
+        """
+        for row in rows:
+            day = _day_key(row['timestamp'])
+            keys = {
+                "daily": (day,),
+                "monthly": (_month_key(row['timestamp']),),
+                "product_daily": (day, row['product_name']),
+            }
+            for name, key in keys.items():
+                cell = self.tables[name].get(key)
+                if cell is None:
+                    self.tables[name][key] = [row['total'], row['qty']]
+                else:
+                    cell[0] += row['total']
+                    cell[1] += row['qty']
+        self.history_rows += len(rows)
+        self.dirty = True
+        self._frames = {}
+
+    def frame(self, name):
+        """
+        @brief table as a DataFrame sorted by day, timestamp parsed; cached until the next change
+        """
+        if name not in self._frames:
+            keys = ROLLUPS[name]
+            rows = [(*k, t, q) for k, (t, q) in sorted(self.tables[name].items(), key=lambda kv: kv[0][0])]
+            df = pd.DataFrame(rows, columns=keys + ["total", "qty"])
+            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            self._frames[name] = df
+        return self._frames[name]
+
+    def query(self, name, start_date=None, end_date=None):
+        """
+        @brief rows of a table whose day lies in [start_date, end_date]
+        @param start_date date or None
+        @param end_date date (inclusive) or None
+        """
+        df = self.frame(name)
+        ts = df['timestamp'].to_numpy()
+        left = 0 if start_date is None else ts.searchsorted(pd.Timestamp(start_date).to_datetime64(), side='left')
+        right = len(df) if end_date is None else ts.searchsorted(pd.Timestamp(end_date).to_datetime64(), side='right')
+        return df.iloc[left:right]
+
+    def revenue_series(self, start_date=None, end_date=None, mode="Day"):
+        """
+        @brief revenue per day or per month inside the range
+        @return (list of datetime, list of revenue)
+        """
+        days = self.query("daily", start_date, end_date)
+        if mode != "Month" or days.empty:
+            return vf.group_by_time(days, mode)
+
+        # whole months come straight from the monthly table, the edge months from daily rows
+        months = self.frame("monthly")
+        if start_date is not None:
+            months = months[months['timestamp'] >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            months = months[months['timestamp'] + pd.offsets.MonthEnd(0) <= pd.Timestamp(end_date)]
+        day_month = days['timestamp'].dt.to_period('M').dt.to_timestamp()
+        edges = days[~day_month.isin(months['timestamp'])]
+        return vf.group_by_time(pd.concat([months, edges], ignore_index=True), "Month")
+
+    def dashboard(self, start_date, end_date, mode, category_map):
+        """
+        @brief everything the analytics view shows for a date range
+        @param category_map current product name -> category, applied to every sale in the range
+        @return dict with stats, series, category totals and hierarchy
+        """
+        products = vf.add_categories(self.query("product_daily", start_date, end_date), category_map)
+        categories = _category_daily(products)
+        total_rev, total_qty, top_cat = vf.get_stats(categories)
+        return {
+            "stats": (total_rev, total_qty, top_cat),
+            "series": self.revenue_series(start_date, end_date, mode),
+            "categories": vf.category_totals(categories),
+            "hierarchy": vf.group_hierarchy(products),
+        }
+
+
+def _category_daily(products):
+    """
+    @brief revenue/qty per day and category from per day/product rows with a category column
+    """
+    return products.groupby(['timestamp', 'category'], sort=True)[['total', 'qty']].sum().reset_index()
+
+def dashboard_from_products(products, mode="Day"):
+    """
+    @brief the same dashboard dict from per day/product rows that carry a category column,
+    e.g. the product_daily rows of a SQL query
+    @param products DataFrame with timestamp, product_name, category, total, qty
+    """
+    days = products.groupby('timestamp', sort=True)[['total', 'qty']].sum().reset_index()
+    categories = _category_daily(products)
+    total_rev, total_qty, top_cat = vf.get_stats(categories)
+    return {
+        "stats": (total_rev, total_qty, top_cat),
+        "series": vf.group_by_time(days, mode),
+        "categories": vf.category_totals(categories),
+        "hierarchy": vf.group_hierarchy(products),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="rebuild the sales rollup tables from raw history")
+    parser.add_argument("--history", default="sales_history.csv")
+    args = parser.parse_args()
+
+    # stream the history in chunks, the rebuild never holds all of it in memory
+    from history_store import open_history_store
+    store = open_history_store(args.history)
+    rollups = RollupTables(args.history)
+    rollups.rebuild(store.iter_chunks())
+    rollups.save()
+    store.close()
+    print(f"rebuilt {', '.join(ROLLUPS)} from {rollups.history_rows} sales")
+
+if __name__ == "__main__":
+    main()
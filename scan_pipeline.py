@@ -0,0 +1,186 @@
+"""
+@file scan_pipeline.py
+@brief capture and decode QR frames off the Tk main thread.
+capture thread -> latest frame slot -> decode worker -> result queue -> UI via after()
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import instrument
+
+class LatestSlot:
+    """
+    @brief thread safe holder for the newest item, older unread items are overwritten
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def take(self, timeout=None):
+        """
+        @brief wait for an item and remove it
+        @return item or None on timeout
+        """
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+
+class RateCounter:
+    """
+    @brief events per second over a sliding window plus recent latency samples
+    """
+    def __init__(self, window=2.0, samples=200):
+        self.window = window
+        self._times = deque()
+        self._latency = deque(maxlen=samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def tick(self, latency=None):
+        now = time.perf_counter()
+        with self._lock:
+            self.count += 1
+            self._times.append(now)
+            while self._times and now - self._times[0] > self.window:
+                self._times.popleft()
+            if latency is not None:
+                self._latency.append(latency)
+
+    def rate(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            span = self._times[-1] - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+    def latency_ms(self):
+        """
+        @return (mean, max) of recent latencies in milliseconds
+        """
+        with self._lock:
+            if not self._latency:
+                return 0.0, 0.0
+            return (sum(self._latency) / len(self._latency) * 1000, max(self._latency) * 1000)
+
+
+class ScanPipeline:
+    """
+    @brief producer/consumer pipeline around a frame source
+    @param source object with read() -> (ok, frame) and release(), e.g. cv2.VideoCapture
+    @param decoder function frame -> list of decoded strings
+    @param display optional function frame -> display image, runs on the capture thread
+    """
+    def __init__(self, source, decoder, display=None):
+        self.source = source
+        self.decoder = decoder
+        self.display = display
+
+        self.frames = LatestSlot()
+        self.display_frames = LatestSlot()
+        self.results = queue.Queue()
+
+        self.capture_rate = RateCounter()
+        self.decode_rate = RateCounter()
+
+        self._running = threading.Event()
+        self._threads = []
+
+    def start(self):
+        if self._running.is_set():
+            return
+        self._running.set()
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="scan-capture", daemon=True),
+            threading.Thread(target=self._decode_loop, name="scan-decode", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout=1.0):
+        self._running.clear()
+        self.frames.wake()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def _capture_loop(self):
+        while self._running.is_set():
+            ok, frame = self.source.read()
+            if not ok:
+                # source exhausted or camera hiccup, do not spin
+                time.sleep(0.01)
+                continue
+            captured = time.perf_counter()
+            self.capture_rate.tick()
+
+            # decode worker only ever sees the newest frame
+            self.frames.put((captured, frame))
+            if self.display is not None:
+                self.display_frames.put(self.display(frame))
+
+    def _decode_loop(self):
+        while self._running.is_set():
+            item = self.frames.take(timeout=0.1)
+            if item is None:
+                continue
+            captured, frame = item
+            with instrument.span("scan.decode"):
+                codes = self.decoder(frame)
+            done = time.perf_counter()
+            self.decode_rate.tick(done - captured)
+            for code in codes:
+                self.results.put((code, done))
+
+    def latest_display(self):
+        """
+        @brief newest display image or None if nothing new since the last call
+        """
+        return self.display_frames.take(timeout=0)
+
+    def poll_results(self):
+        """
+        @brief drain decoded codes without blocking
+        @return list of (code, time)
+        """
+        found = []
+        while True:
+            try:
+                found.append(self.results.get_nowait())
+            except queue.Empty:
+                return found
+
+    def stats(self):
+        """
+        @brief pipeline counters for display/logging
+        """
+        mean_ms, max_ms = self.decode_rate.latency_ms()
+        return {
+            "capture_fps": self.capture_rate.rate(),
+            "decode_fps": self.decode_rate.rate(),
+            "decode_latency_ms": mean_ms,
+            "decode_latency_max_ms": max_ms,
+            "frames_captured": self.capture_rate.count,
+            "frames_decoded": self.decode_rate.count,
+            "frames_skipped": self.frames.dropped,
+        }
@@ -6,27 +6,43 @@ import customtkinter as ctk
 import tkinter as tk
 from tkinter import ttk, messagebox
 import cv2
-from pyzbar.pyzbar import decode
 from PIL import Image, ImageTk
 import time
 from datetime import datetime
+from scan_pipeline import ScanPipeline
+from qr_decoder import QRDecoder
+from frame_source import open_source
+import instrument
+
+def to_display(frame):
+    """
+    @brief BGR camera frame to a PIL image, runs on the capture thread
+    """
+    return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA))
 
 class ScannerFrame(ctk.CTkFrame):
     """
     @brief UI for QR scanning and cart system
     """
-    def __init__(self, parent, data_manager):
+    def __init__(self, parent, data_manager, source="camera:0"):
         """
         @brief constructor of scan dataframe
+        @param source frame source spec, see frame_source.open_source
         """
         super().__init__(parent, corner_radius=0, fg_color="transparent")
         self.data_manager = data_manager
+        self.source = source
         self.cart = []
+        # cart index -> treeview item id, and the running grand total
+        self.cart_iids = []
+        self.cart_total = 0
         
         # camera state
         self.cap = None
+        self.pipeline = None
         self.scanning_active = False
         self.last_scan_time = 0
+        self._loop_id = None
 
         self._setup_layout()
 
@@ -47,6 +63,8 @@ class ScannerFrame(ctk.CTkFrame):
         self.lbl_camera.pack(expand=True, fill="both", padx=10, pady=10)
         self.lbl_status = ctk.CTkLabel(cam_frame, text="Ready to Scan", text_color="gray")
         self.lbl_status.pack(pady=10)
+        self.lbl_pipeline = ctk.CTkLabel(cam_frame, text="", text_color="gray", font=("Arial", 10))
+        self.lbl_pipeline.pack(pady=(0, 10))
 
         # cart system part
         cart_frame = ctk.CTkFrame(self)
@@ -74,41 +92,57 @@ class ScannerFrame(ctk.CTkFrame):
         @brief start camera and activate scanning
         """
         if self.cap is None:
-            self.cap = cv2.VideoCapture(0)
+            self.cap = open_source(self.source)
+        if self.pipeline is None:
+            self.pipeline = ScanPipeline(self.cap, QRDecoder("adaptive"), to_display)
+            self.pipeline.start()
         self.scanning_active = True
-        self._update_camera_loop()
+        if self._loop_id is None:
+            self._update_camera_loop()
 
     def stop_scanning(self):
         """
         @brief stop scanning
         """
         self.scanning_active = False
+        if self._loop_id is not None:
+            self.lbl_camera.after_cancel(self._loop_id)
+            self._loop_id = None
+        if self.pipeline is not None:
+            self.pipeline.stop()
+            self.pipeline = None
         if self.cap is not None:
             self.cap.release()
             self.cap = None
 
+    @instrument.timed("scan.ui_loop")
     def _update_camera_loop(self):
         """
-        @brief read a frame, decode QR codes
-        """
-        if self.cap is not None and self.scanning_active:
-            ret, frame = self.cap.read()
-            if ret:
-                decoded_objs = decode(frame)
-                current_time = time.time()
-                
-                if decoded_objs and (current_time - self.last_scan_time > 2.0):
-                    qr_data = decoded_objs[0].data.decode('utf-8')
-                    self._handle_scan(qr_data)
-                
-                cv2image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA)
-                img = Image.fromarray(cv2image)
-                imgtk = ImageTk.PhotoImage(image=img)
-                self.lbl_camera.imgtk = imgtk
-                self.lbl_camera.configure(image=imgtk)
-            
-            #recursive call camera
-            self.lbl_camera.after(20, self._update_camera_loop)
+        @brief show the newest frame and handle decoded QR codes from the pipeline,
+        capture and decoding run on worker threads
+        """
+        self._loop_id = None
+        if self.pipeline is None or not self.scanning_active:
+            return
+
+        img = self.pipeline.latest_display()
+        if img is not None:
+            imgtk = ImageTk.PhotoImage(image=img)
+            self.lbl_camera.imgtk = imgtk
+            self.lbl_camera.configure(image=imgtk)
+
+        results = self.pipeline.poll_results()
+        if results and (time.time() - self.last_scan_time > 2.0):
+            self._handle_scan(results[0][0])
+
+        if self.pipeline is not None:
+            stats = self.pipeline.stats()
+            self.lbl_pipeline.configure(
+                text=f"{stats['capture_fps']:.0f} fps | decode {stats['decode_latency_ms']:.0f} ms")
+
+        #recursive call camera
+        if self.scanning_active:
+            self._loop_id = self.lbl_camera.after(20, self._update_camera_loop)
 
     def _handle_scan(self, qr_data):
         """
@@ -138,7 +172,9 @@ class ScannerFrame(ctk.CTkFrame):
             
         self.last_scan_time = time.time()
         self.scanning_active = True
-        self._update_camera_loop()
+        # codes decoded while the dialog was open are stale
+        if self.pipeline is not None:
+            self.pipeline.poll_results()
 
     def _add_to_cart(self, product, qty):
         """
@@ -155,25 +191,33 @@ class ScannerFrame(ctk.CTkFrame):
             "total": subtotal,
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         })
-        self._refresh_cart_ui()
+        self._insert_cart_row(self.cart[-1])
+
+    def _insert_cart_row(self, item):
+        """
+        @brief insert only the new cart row and add it to the running total
+        """
+        iid = self.tree_cart.insert("", "end", values=(item["product_name"], item["price"], item["qty"], item["total"]))
+        self.cart_iids.append(iid)
+        self.cart_total += item["total"]
+        self._refresh_total()
 
-    def _refresh_cart_ui(self):
+    def _refresh_total(self):
         """
-        @brief refresh the cart UI and total label
+        @brief update the total label from the running sum
         """
-        for i in self.tree_cart.get_children(): self.tree_cart.delete(i)
-        grand_total = 0
-        for item in self.cart:
-            self.tree_cart.insert("", "end", values=(item["product_name"], item["price"], item["qty"], item["total"]))
-            grand_total += item["total"]
-        self.lbl_total.configure(text=f"Total: Rp{grand_total:.2f}")
+        self.lbl_total.configure(text=f"Total: Rp{self.cart_total:.2f}")
 
     def clear_cart(self):
         """
         @brief clear the current cart contents and update the UI
         """
+        if self.cart_iids:
+            self.tree_cart.delete(*self.cart_iids)
         self.cart = []
-        self._refresh_cart_ui()
+        self.cart_iids = []
+        self.cart_total = 0
+        self._refresh_total()
 
     def checkout(self):
         """
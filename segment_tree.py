@@ -1,73 +1,184 @@
 '''
-@brief: implement segment tree data structure to store products
+@brief: implement segment tree data structure for range sums over sales history
 '''
+import numpy as np
+import pandas as pd
+
+def _bucket_sums(buckets, values, n):
+    """
+    @brief sum of values per bucket, integer columns stay integer
+    """
+    sums = np.bincount(buckets, weights=values.astype(float), minlength=n)
+    if np.issubdtype(values.dtype, np.integer):
+        # float sums are exact below 2**53, far above any day of sales
+        return sums.round().astype(np.int64)
+    return sums
 
-class product_node:
-    def __init__(self, name, val, category, qr):
-        self.name = name
-        self.price = val
-        self.category = category
-        self.qr_data = qr
-
-    def setVal(self, name, val, category, qr):
-        self.name = name
-        self.price = val
-        self.category = category
-        self.qr_data = qr
-    
 class SegmentTree:
-    def __init__(self, size, prod):
-        self.size = size
-        self.tree = [product_node("", 0, "", "") for i in range(4 * size)]
-        self.build(1, 0, self.size-1, prod)
+    """
+    @brief array backed sum segment tree, leaves live at tree[size:2*size]
+    """
+    def __init__(self, size, values=None):
+        self.size = max(1, size)
+        self.tree = [0] * (2 * self.size)
+        if values is not None:
+            self.build(values)
+
+    def build(self, values):
+        """
+        @brief fill the leaves from values and compute every parent in O(n)
+        """
+        n = min(len(values), self.size)
+        self.tree[self.size:self.size + n] = list(values[:n])
+        for node in range(self.size - 1, 0, -1):
+            self.merge(node)
 
     def merge(self, node):
-        left_child = self.tree[2 * node]
-        right_child = self.tree[2 * node + 1]
-        
-        self.tree[node].price = left_child.price + right_child.price
-
-    def update(self, node, left, right, idx, prod):
-        """
-        Updates a speicific product id with new price and name.
-        """
-        if left == right:
-            # Leaf node reached
-            self.tree[node] = prod
-            return
-
-        mid = (left + right) // 2
-        if idx <= mid:
-            self.update(2 * node, left, mid, idx, prod)
-        else:
-            self.update(2 * node + 1, mid + 1, right, idx, prod)
-        
-        self.merge(node)
-
-    def update_value(self, idx, prod):
-        self.update(1, 0, self.size - 1, idx, prod)
-
-    def get_total_sum(self, node, left, right, l_range, r_range):
-        if(r_range < left or right < l_range):
-            return 0
-        if(l_range <= left and r_range >= right):
-            return self.tree[node].price
-        
-        mid = (left + right)//2
-        return self.get_total_sum(node * 2, left, mid, l_range, r_range) + self.get_total_sum(node * 2 + 1, mid+1, right, l_range, r_range)
-        
-    def build(self, node, left, right, prod):
-        if(left == right):
-            self.tree[node] = prod[left]
-            return
-        mid = (left + right)//2
-        self.build(self, 2 * node, left, mid, prod)
-        self.build(self, 2 * node + 1, mid + 1, right, prod)
-        self.merge(node)
-  
-
-    
-    def get_stats(self):
-        total = self.get_total_sum(1, 0, self.size - 1, 0, self.size - 1)
-        
+        self.tree[node] = self.tree[2 * node] + self.tree[2 * node + 1]
+
+    def add(self, idx, delta):
+        """
+        @brief add delta to leaf idx and update its ancestors, O(log n)
+        """
+        node = idx + self.size
+        self.tree[node] += delta
+        node //= 2
+        while node >= 1:
+            self.merge(node)
+            node //= 2
+
+    def update_value(self, idx, value):
+        """
+        @brief set leaf idx to value
+        """
+        self.add(idx, value - self.tree[idx + self.size])
+
+    def get_total_sum(self, l_range, r_range):
+        """
+        @brief sum of leaves l_range..r_range (inclusive), O(log n)
+        """
+        l_range = max(l_range, 0)
+        r_range = min(r_range, self.size - 1)
+        total = 0
+        left = l_range + self.size
+        right = r_range + self.size + 1
+        while left < right:
+            if left & 1:
+                total += self.tree[left]
+                left += 1
+            if right & 1:
+                right -= 1
+                total += self.tree[right]
+            left //= 2
+            right //= 2
         return total
+
+    def leaves(self):
+        return self.tree[self.size:]
+
+    def get_stats(self):
+        return self.tree[1]
+
+
+class SalesTree:
+    """
+    @brief revenue and quantity per day bucket, backed by two segment trees.
+    Bucket i holds the sales of origin + i days.
+    """
+    def __init__(self, origin=None, capacity=1024):
+        self.origin = origin
+        self.revenue = SegmentTree(capacity)
+        self.qty = SegmentTree(capacity)
+
+    @classmethod
+    def from_history(cls, df_history):
+        """
+        @brief build the tree from a sales history DataFrame in O(n)
+        @param df_history DataFrame with timestamp, total and qty columns
+        """
+        return cls.from_chunks((df_history,))
+
+    @classmethod
+    def from_chunks(cls, chunks):
+        """
+        @brief build the tree from history chunks (HistoryStore.iter_chunks) in O(n),
+        one bincount per chunk, memory is one chunk plus the day buckets
+        @param chunks iterable of DataFrames with timestamp, total and qty columns
+        """
+        # (first day number, revenue per day, qty per day) of every chunk
+        parts = []
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            days = pd.to_datetime(chunk['timestamp']).to_numpy().astype('datetime64[D]').astype(np.int64)
+            first = int(days.min())
+            buckets = days - first
+            n = int(buckets.max()) + 1
+            parts.append((first, _bucket_sums(buckets, chunk['total'].to_numpy(), n),
+                          _bucket_sums(buckets, chunk['qty'].to_numpy(), n)))
+        if not parts:
+            return cls()
+
+        first = min(p[0] for p in parts)
+        n = max(p[0] + len(p[1]) for p in parts) - first
+        revenue = np.zeros(n, np.result_type(*(p[1] for p in parts)))
+        qty = np.zeros(n, np.result_type(*(p[2] for p in parts)))
+        for start, rev, q in parts:
+            revenue[start - first:start - first + len(rev)] += rev
+            qty[start - first:start - first + len(q)] += q
+
+        origin = np.datetime64(first, 'D').astype(object)
+        tree = cls(origin, capacity=max(1024, 2 * n))
+        tree.revenue.build(revenue.tolist())
+        tree.qty.build(qty.tolist())
+        return tree
+
+    def _bucket(self, day):
+        return (day - self.origin).days
+
+    def _regrow(self, origin, capacity):
+        """
+        @brief rebuild both trees with a new origin/capacity, keeps bucket values
+        """
+        shift = (self.origin - origin).days if self.origin is not None else 0
+        rev = [0] * capacity
+        qty = [0] * capacity
+        for i, (r, q) in enumerate(zip(self.revenue.leaves(), self.qty.leaves())):
+            if r or q:
+                rev[i + shift] = r
+                qty[i + shift] = q
+        self.origin = origin
+        self.revenue = SegmentTree(capacity, rev)
+        self.qty = SegmentTree(capacity, qty)
+
+    def add_sale(self, timestamp, total, qty):
+        """
+        @brief add one sale to its day bucket, O(log n) unless the tree has to grow
+        @param timestamp datetime or "YYYY-MM-DD HH:MM:SS" string
+        """
+        day = pd.Timestamp(timestamp).date()
+        if self.origin is None:
+            self.origin = day
+        if day < self.origin:
+            shift = (self.origin - day).days
+            self._regrow(day, 2 * (self.revenue.size + shift))
+        idx = self._bucket(day)
+        if idx >= self.revenue.size:
+            self._regrow(self.origin, 2 * (idx + 1))
+        self.revenue.add(idx, total)
+        self.qty.add(idx, qty)
+
+    def range_sum(self, start_date=None, end_date=None):
+        """
+        @brief total revenue and quantity sold between two days (inclusive)
+        @param start_date date or None for the first bucket
+        @param end_date date or None for the last bucket
+        @return (revenue, qty)
+        """
+        if self.origin is None:
+            return 0, 0
+        left = self._bucket(start_date) if start_date is not None else 0
+        right = self._bucket(end_date) if end_date is not None else self.revenue.size - 1
+        if right < left:
+            return 0, 0
+        return self.revenue.get_total_sum(left, right), self.qty.get_total_sum(left, right)
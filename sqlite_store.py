@@ -0,0 +1,243 @@
+"""
+@file sqlite_store.py
+@brief SQLite storage for products and sales, shared by several cashier processes.
+The database runs in WAL mode so analytics readers never block a checkout, every
+cart is written in one transaction and range queries are answered in SQL.
+"""
+import sqlite3
+import threading
+from datetime import timedelta
+
+import pandas as pd
+
+from history_store import CHUNK_ROWS, HISTORY_COLUMNS, HistoryStore
+from product_store import PRODUCT_COLUMNS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    price NUMERIC NOT NULL,
+    category TEXT NOT NULL,
+    qr_data TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS products_name ON products(name);
+CREATE TABLE IF NOT EXISTS sales (
+    id INTEGER PRIMARY KEY,
+    product_name TEXT NOT NULL,
+    price NUMERIC NOT NULL,
+    qty INTEGER NOT NULL,
+    total NUMERIC NOT NULL,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sales_timestamp ON sales(timestamp);
+"""
+
+def _day_bounds(start_date, end_date):
+    """
+    @brief WHERE clause and parameters for start_date <= day <= end_date on the text timestamp
+    """
+    clauses, params = [], []
+    if start_date is not None:
+        clauses.append("timestamp >= ?")
+        params.append(str(start_date))
+    if end_date is not None:
+        clauses.append("timestamp < ?")
+        params.append(str(end_date + timedelta(days=1)))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class SqliteHistoryStore(HistoryStore):
+    """
+    @brief sales and products tables in one SQLite file
+    @param path database file, created with the schema when missing
+    @param timeout seconds to wait for another process holding the write lock
+    """
+    def __init__(self, path, fsync_every=8, timeout=30.0):
+        super().__init__(path, fsync_every)
+        # one connection, used from the Tk thread and the analytics worker
+        self.conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        # second connection for long analytics reads, so they never hold up checkouts
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: a commit survives a crash of the app, fsync happens at checkpoints
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+
+    def _transaction(self, statements):
+        """
+        @brief run (sql, params or list of params) pairs in one write transaction
+        """
+        with self._lock:
+            # take the write lock up front so concurrent checkouts queue instead of deadlocking
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    if isinstance(params, list):
+                        self.conn.executemany(sql, params)
+                    else:
+                        self.conn.execute(sql, params)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _read_frame(self, sql, params=()):
+        """
+        @brief run a read query on the analytics connection, WAL gives it its own snapshot
+        """
+        with self._reader_lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            return pd.read_sql_query(sql, self._reader, params=params)
+
+    def load(self):
+        with self._lock:
+            return pd.read_sql_query(f"SELECT {', '.join(HISTORY_COLUMNS)} FROM sales ORDER BY timestamp, id", self.conn)
+
+    def iter_chunks(self, start_date=None, end_date=None, chunksize=CHUNK_ROWS):
+        """
+        @brief range scan on the timestamp index through a separate read-only connection,
+        so a long stream never holds the lock checkouts need
+        """
+        where, params = _day_bounds(start_date, end_date)
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        try:
+            for chunk in pd.read_sql_query(
+                    f"SELECT {', '.join(HISTORY_COLUMNS)} FROM sales{where} ORDER BY timestamp, id",
+                    conn, params=params, chunksize=chunksize):
+                chunk['timestamp'] = pd.to_datetime(chunk['timestamp'])
+                yield chunk
+        finally:
+            conn.close()
+
+    def append(self, rows):
+        """
+        @brief insert one cart in a single transaction, committed on return
+        """
+        self._transaction([(
+            f"INSERT INTO sales ({', '.join(HISTORY_COLUMNS)}) VALUES (?, ?, ?, ?, ?)",
+            [tuple(str(row[col]) if col == 'timestamp' else row[col] for col in HISTORY_COLUMNS) for row in rows],
+        )])
+
+    def rewrite(self, df):
+        rows = list(zip(df['product_name'].astype(str), df['price'].tolist(), df['qty'].tolist(),
+                        df['total'].tolist(), df['timestamp'].astype(str)))
+        self._transaction([
+            ("DELETE FROM sales", ()),
+            (f"INSERT INTO sales ({', '.join(HISTORY_COLUMNS)}) VALUES (?, ?, ?, ?, ?)", rows),
+        ])
+
+    def close(self):
+        with self._lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+        with self._reader_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+    # products
+
+    def load_products(self):
+        """
+        @return products table as a DataFrame with PRODUCT_COLUMNS
+        """
+        with self._lock:
+            return pd.read_sql_query(f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products ORDER BY id", self.conn)
+
+    def insert_products(self, df):
+        """
+        @brief add products, used to import products.csv into an empty database
+        """
+        self._transaction([(
+            f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES (?, ?, ?, ?)",
+            list(df[PRODUCT_COLUMNS].itertuples(index=False, name=None)),
+        )])
+
+    def add_product(self, name, price, category, qr_data):
+        """
+        @throws sqlite3.IntegrityError if qr_data is already used, also by another terminal
+        """
+        self._transaction([(
+            f"INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES (?, ?, ?, ?)",
+            (name, price, category, qr_data),
+        )])
+
+    def upsert_products(self, df):
+        """
+        @brief insert new QR codes and update existing ones in one transaction
+        """
+        self._transaction([(
+            f"""INSERT INTO products ({', '.join(PRODUCT_COLUMNS)}) VALUES (?, ?, ?, ?)
+                ON CONFLICT(qr_data) DO UPDATE SET
+                    name = excluded.name, price = excluded.price, category = excluded.category""",
+            list(df[PRODUCT_COLUMNS].itertuples(index=False, name=None)),
+        )])
+
+    def delete_products_by_names(self, names):
+        self._transaction([("DELETE FROM products WHERE name = ?", [(name,) for name in names])])
+
+    def find_product_by_qr(self, qr_data):
+        """
+        @return (name, price, category, qr_data) or None, through the qr_data index
+        """
+        rows = self._query(f"SELECT {', '.join(PRODUCT_COLUMNS)} FROM products WHERE qr_data = ?", (qr_data,))
+        return rows[0] if rows else None
+
+    # analytics pushed down to SQL
+
+    def bounds(self):
+        """
+        @return (first, last) timestamp strings of every terminal's sales, or (None, None)
+        """
+        return tuple(self._query("SELECT MIN(timestamp), MAX(timestamp) FROM sales")[0])
+
+    def version(self):
+        """
+        @return id of the newest sale, read from the end of the rowid b-tree
+        """
+        return self._query("SELECT COALESCE(MAX(id), 0) FROM sales")[0][0]
+
+    def change_count(self):
+        """
+        @return counter that moves when another connection commits, e.g. a catalog change
+        made by another terminal
+        """
+        return self._query("PRAGMA data_version")[0][0]
+
+    def sales_totals(self, start_date=None, end_date=None):
+        """
+        @return (revenue, qty) between two days (inclusive), a range scan on the timestamp index
+        """
+        where, params = _day_bounds(start_date, end_date)
+        rev, qty = self._query(f"SELECT COALESCE(SUM(total), 0), COALESCE(SUM(qty), 0) FROM sales{where}", params)[0]
+        return rev, qty
+
+    def product_daily(self, start_date=None, end_date=None):
+        """
+        @brief revenue/qty per day and product, with the product category joined in
+        @return DataFrame with timestamp (datetime), product_name, category, total, qty
+        """
+        where, params = _day_bounds(start_date, end_date)
+        # names are not unique in products, the first product (lowest id) gives the category;
+        # SQLite takes the bare category column from the row holding MIN(id)
+        sql = f"""
+            SELECT s.day AS timestamp, s.product_name, COALESCE(c.category, 'Uncategorized') AS category,
+                   s.total, s.qty
+            FROM (SELECT substr(timestamp, 1, 10) AS day, product_name, SUM(total) AS total, SUM(qty) AS qty
+                  FROM sales{where} GROUP BY day, product_name) AS s
+            LEFT JOIN (SELECT name, category, MIN(id) FROM products GROUP BY name) AS c
+                   ON c.name = s.product_name
+            ORDER BY s.day"""
+        df = self._read_frame(sql, params)
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        return df
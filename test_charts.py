@@ -0,0 +1,60 @@
+"""
+@file test_charts.py
+@brief repeated dashboard chart refreshes keep the artist count and memory flat (Agg backend)
+"""
+import gc
+import os
+import random
+from datetime import datetime, timedelta
+
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import pytest
+
+from charts import CategoryChart, RevenueChart
+
+WARMUP = 20
+REFRESHES = 60
+
+def artist_count(figure):
+    """@brief axes and the artists drawn on them, tick labels aside (they follow the data)"""
+    return len(figure.axes), sum(len(ax.get_children()) for ax in figure.axes)
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="resident memory is read from /proc")
+def test_refreshes_stay_flat():
+    rng = random.Random(4)
+    start = datetime(2025, 1, 1)
+    hist, cat = RevenueChart(dpi=50), CategoryChart(dpi=50)
+    canvases = (FigureCanvasAgg(hist.figure), FigureCanvasAgg(cat.figure))
+    # bucket count, category count and mode cycle, so bars are rebuilt as well as reused
+    shapes = [(5, 2, "Day"), (30, 6, "Day"), (12, 10, "Month"), (12, 4, "Month")]
+
+    def refresh(i):
+        days, categories, mode = shapes[i % len(shapes)]
+        dates = [start + timedelta(days=d) for d in range(days)]
+        hist.update(dates, [rng.randint(10_000, 500_000) for _ in dates], mode)
+        cat.update({f"Cat {c}": rng.randint(1, 100) for c in range(categories)})
+        for canvas in canvases:
+            canvas.draw()
+
+    for i in range(WARMUP):
+        refresh(i)
+    counts = (artist_count(hist.figure), artist_count(cat.figure))
+    gc.collect()
+    before = rss_mb()
+    for i in range(WARMUP, WARMUP + REFRESHES):
+        refresh(i)
+        if i % len(shapes) == len(shapes) - 1:
+            assert (artist_count(hist.figure), artist_count(cat.figure)) == counts
+    gc.collect()
+    # a new figure per refresh, as the charts used to do, grows by far more than this
+    assert rss_mb() - before < 4, (before, rss_mb())
+
+    hist.close()
+    cat.close()
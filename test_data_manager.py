@@ -0,0 +1,138 @@
+"""
+@file test_data_manager.py
+@brief DataManager catalog imports and the dashboard cache, against a temporary products CSV
+and sales history
+"""
+import pandas as pd
+import pytest
+
+from data_manager import DataManager
+
+PRODUCTS = [
+    {"name": "Beras", "price": 72000, "category": "Sembako", "qr_data": "QR1"},
+    {"name": "Gula", "price": 15000, "category": "Sembako", "qr_data": "QR2"},
+    {"name": "Kopi", "price": 3000, "category": "Minuman", "qr_data": "QR3"},
+]
+
+@pytest.fixture
+def dm(tmp_path):
+    products = tmp_path / "products.csv"
+    pd.DataFrame(PRODUCTS).to_csv(products, index=False)
+    manager = DataManager(str(products), str(tmp_path / "sales_history.csv"))
+    yield manager
+    manager.close()
+
+def catalog(manager):
+    return {p["qr_data"]: (p["name"], p["price"], p["category"]) for p in manager.products}
+
+
+def test_import_counts(dm):
+    result = dm.import_products([
+        {"name": "Beras", "price": 72000, "category": "Sembako", "qr_data": "QR1"},
+        {"name": "Gula", "price": 16000, "category": "Sembako", "qr_data": "QR2"},
+        {"name": "Teh", "price": 2000, "category": "Minuman", "qr_data": "QR4"},
+    ])
+    assert (result["inserted"], result["updated"], result["unchanged"], result["rejected"]) == (1, 1, 1, 0)
+    assert catalog(dm)["QR2"] == ("Gula", 16000, "Sembako")
+    assert catalog(dm)["QR4"] == ("Teh", 2000, "Minuman")
+    # written once to the products CSV
+    saved = pd.read_csv(dm.products_file, dtype={"qr_data": str})
+    assert sorted(saved["qr_data"]) == ["QR1", "QR2", "QR3", "QR4"]
+
+def test_import_rejects_invalid_rows(dm):
+    result = dm.import_products(pd.DataFrame([
+        {"name": "", "price": 1000, "qr_data": "QR5"},
+        {"name": "Susu", "price": -1, "qr_data": "QR6"},
+        {"name": "Roti", "price": "abc", "qr_data": "QR7"},
+        {"name": "Mie", "price": 3500, "qr_data": " "},
+        {"name": "Telur", "price": 2500, "qr_data": "QR8"},
+    ]))
+    assert result["inserted"] == 1 and result["rejected"] == 4
+    assert [i for i, _ in result["errors"]] == [0, 1, 2, 3]
+    assert dict(result["errors"])[0] == "name is empty"
+    assert dict(result["errors"])[3] == "qr_data is empty"
+    assert catalog(dm)["QR8"] == ("Telur", 2500, "Uncategorized")
+    assert not {"QR5", "QR6", "QR7"} & set(catalog(dm))
+
+def test_import_last_row_wins_for_repeated_qr(dm):
+    result = dm.import_products([
+        {"name": "Teh", "price": 2000, "category": "Minuman", "qr_data": "QR4"},
+        {"name": "Kopi", "price": 3100, "category": "Minuman", "qr_data": "QR3"},
+        {"name": "Teh Manis", "price": 2500, "category": "Minuman", "qr_data": "QR4"},
+    ])
+    assert (result["inserted"], result["updated"], result["rejected"]) == (1, 1, 1)
+    assert result["errors"] == [(0, "duplicate qr_data, a later row replaces it")]
+    assert catalog(dm)["QR4"] == ("Teh Manis", 2500, "Minuman")
+    assert len(dm.products) == 4
+
+@pytest.mark.parametrize("source", [[], pd.DataFrame(), pd.DataFrame(columns=["name", "price", "qr_data"])],
+                         ids=["list", "frame", "header only"])
+def test_import_empty_source(dm, source):
+    seq = dm.catalog_seq
+    result = dm.import_products(source)
+    assert result == {"inserted": 0, "updated": 0, "unchanged": 0, "rejected": 0, "errors": []}
+    assert dm.catalog_seq == seq and len(dm.products) == 3
+
+def test_import_empty_file(dm, tmp_path):
+    empty = tmp_path / "empty.csv"
+    empty.write_text("")
+    assert dm.import_products(str(empty))["inserted"] == 0
+
+
+def sale(name, price, qty=1, timestamp="2024-03-10 10:00:00"):
+    return {"product_name": name, "price": price, "qty": qty, "total": price * qty, "timestamp": timestamp}
+
+def test_checkout_moves_version_and_recomputes(dm):
+    dm.record_transaction([sale("Beras", 72000)])
+    first = dm.dashboard_data()
+    assert dm.dashboard_data() is first and dm.cache_hits == 1
+
+    version = dm.data_version()
+    dm.record_transaction([sale("Kopi", 3000, 2)])
+    assert dm.data_version() != version
+    assert dm.cached_dashboard() is None
+    second = dm.dashboard_data()
+    assert second is not first and second["version"] == dm.data_version()
+    assert second["stats"][:2] == (78000, 3)
+
+def test_category_change_recomputes(dm):
+    dm.record_transaction([sale("Kopi", 3000, 30), sale("Beras", 72000)])
+    first = dm.dashboard_data()
+    assert first["categories"] == {"Minuman": 90000, "Sembako": 72000}
+
+    dm.import_products([{"name": "Kopi", "price": 3000, "category": "Sembako", "qr_data": "QR3"}])
+    assert dm.cached_dashboard() is None
+    second = dm.dashboard_data()
+    assert second is not first
+    assert second["categories"] == {"Sembako": 162000}
+    assert second["stats"][2] == "Sembako"
+
+def test_price_only_import_keeps_cache(dm):
+    dm.record_transaction([sale("Gula", 15000)])
+    first = dm.dashboard_data()
+    version = dm.data_version()
+
+    result = dm.import_products([{"name": "Gula", "price": 16000, "category": "Sembako", "qr_data": "QR2"}])
+    assert result["updated"] == 1
+    # recorded sales keep their price, the dashboard does not change
+    assert dm.data_version() == version
+    assert dm.cached_dashboard() is first
+
+@pytest.mark.parametrize("history", ["sales_history.csv", "store.db"], ids=["csv", "db"])
+def test_repeated_name_takes_first_product_category(tmp_path, history):
+    products = tmp_path / "products.csv"
+    # MIN(category) and last-row-wins would both pick "Bubuk"
+    pd.DataFrame(PRODUCTS + [{"name": "Kopi", "price": 5000, "category": "Bubuk", "qr_data": "QR9"}]) \
+        .to_csv(products, index=False)
+    manager = DataManager(str(products), str(tmp_path / history))
+    try:
+        manager.record_transaction([sale("Kopi", 3000, 2), sale("Beras", 72000)])
+        assert manager.products.category_map()["Kopi"] == "Minuman"
+        assert manager.products.category_of("Kopi") == "Minuman"
+        assert manager.dashboard_data()["categories"] == {"Minuman": 6000, "Sembako": 72000}
+
+        # with the first one deleted the next product of that name decides
+        manager.products.delete_rows([manager.products.find_by_qr("QR3")])
+        assert manager.products.category_map()["Kopi"] == "Bubuk"
+    finally:
+        manager.close()
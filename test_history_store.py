@@ -0,0 +1,76 @@
+"""
+@file test_history_store.py
+@brief history streams read only complete rows and leave torn files alone, writers repair them
+"""
+import os
+from datetime import date
+
+import pytest
+
+from history_store import ColumnarHistoryStore, CsvHistoryStore, PartitionedHistoryStore
+from sqlite_store import SqliteHistoryStore
+
+ROWS = [{"product_name": f"p{i % 3}", "price": 10, "qty": 1, "total": 10,
+         "timestamp": f"2024-0{1 + i % 3}-0{1 + i % 5} 10:00:00"} for i in range(30)]
+
+def sizes(path):
+    if os.path.isdir(path):
+        return {name: os.path.getsize(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+    return os.path.getsize(path)
+
+def tear(store):
+    """@brief leave a half written append, as a crash or a concurrent writer would"""
+    if isinstance(store, CsvHistoryStore):
+        with open(store.path, "a") as f:
+            f.write("p9,10,1")
+    elif isinstance(store, PartitionedHistoryStore):
+        with open(os.path.join(store.path, "2024-01.csv"), "a") as f:
+            f.write("p9,10,1")
+    else:
+        with open(os.path.join(store.path, "qty.bin"), "ab") as f:
+            f.write(b"\0" * 8)
+        with open(os.path.join(store.path, "names.txt"), "ab") as f:
+            f.write(b"tor")
+
+
+@pytest.fixture(params=[(CsvHistoryStore, "h.csv"), (PartitionedHistoryStore, "h.parts"),
+                        (ColumnarHistoryStore, "h.cols")], ids=["csv", "parts", "cols"])
+def store_path(request, tmp_path):
+    cls, name = request.param
+    path = str(tmp_path / name)
+    store = cls(path)
+    store.append(ROWS)
+    store.close()
+    tear(store)
+    return cls, path
+
+def test_iter_chunks_is_read_only(store_path):
+    cls, path = store_path
+    before = sizes(path)
+    assert sum(len(chunk) for chunk in cls(path).iter_chunks()) == len(ROWS)
+    assert sum(len(chunk) for chunk in cls(path).iter_chunks(date(2024, 1, 1), date(2024, 1, 31))) == 10
+    assert sizes(path) == before
+
+def test_writer_drops_torn_append(store_path):
+    cls, path = store_path
+    store = cls(path)
+    store.append(ROWS[:1])
+    store.close()
+    df = cls(path).load()
+    assert len(df) == len(ROWS) + 1
+    assert set(df["product_name"]) == {"p0", "p1", "p2"}
+
+
+@pytest.mark.parametrize("cls, name", [(CsvHistoryStore, "h.csv"), (PartitionedHistoryStore, "h.parts"),
+                                       (ColumnarHistoryStore, "h.cols"), (SqliteHistoryStore, "h.db")],
+                         ids=["csv", "parts", "cols", "db"])
+def test_fractional_prices_round_trip(tmp_path, cls, name):
+    path = str(tmp_path / name)
+    store = cls(path)
+    store.append([{"product_name": "a", "price": 2500.5, "qty": 2, "total": 5001.0, "timestamp": "2024-01-01 10:00:00"},
+                  {"product_name": "b", "price": 0.25, "qty": 3, "total": 0.75, "timestamp": "2024-01-02 10:00:00"}])
+    store.close()
+    for df in (cls(path).load(), next(cls(path).iter_chunks())):
+        assert df["price"].tolist() == [2500.5, 0.25]
+        assert df["total"].tolist() == [5001.0, 0.75]
+        assert df["total"].sum() == 5001.75
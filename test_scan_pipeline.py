@@ -0,0 +1,95 @@
+"""
+@file test_scan_pipeline.py
+@brief ScanPipeline with a stub frame source and a stub decoder
+"""
+import threading
+import time
+
+from scan_pipeline import LatestSlot, ScanPipeline
+
+class CountingSource:
+    """@brief frames 0..n-1 then (False, None), like an exhausted video file"""
+    def __init__(self, n, delay=0.001):
+        self.n = n
+        self.delay = delay
+        self.next = 0
+
+    def read(self):
+        time.sleep(self.delay)
+        if self.next >= self.n:
+            return False, None
+        frame, self.next = self.next, self.next + 1
+        return True, frame
+
+    def release(self):
+        pass
+
+class SlowDecoder:
+    """@brief one code per frame, slower than the source so frames pile up"""
+    def __init__(self, delay=0.005):
+        self.delay = delay
+        self.seen = []
+
+    def __call__(self, frame):
+        time.sleep(self.delay)
+        self.seen.append(frame)
+        return [f"QR{frame}"]
+
+def run(pipeline, n):
+    pipeline.start()
+    deadline = time.time() + 10
+    while pipeline.capture_rate.count < n and time.time() < deadline:
+        time.sleep(0.01)
+    # let the decoder finish the last frame it took
+    time.sleep(0.1)
+    return pipeline.poll_results()
+
+
+def test_results_in_order_and_stale_frames_dropped():
+    decoder = SlowDecoder()
+    pipeline = ScanPipeline(CountingSource(200), decoder)
+    try:
+        results = run(pipeline, 200)
+    finally:
+        pipeline.stop()
+
+    frames = [int(code[2:]) for code, _ in results]
+    assert frames and frames == decoder.seen
+    # every frame decoded at most once, never an older one after a newer one
+    assert frames == sorted(set(frames))
+    assert [t for _, t in results] == sorted(t for _, t in results)
+    # the decoder is slower than the source, the frames it never saw were overwritten
+    stats = pipeline.stats()
+    assert stats["frames_captured"] == 200
+    assert stats["frames_skipped"] > 0
+    assert stats["frames_decoded"] + stats["frames_skipped"] <= 200
+
+def test_display_frames_keep_only_the_newest():
+    pipeline = ScanPipeline(CountingSource(20), lambda frame: [], display=lambda frame: -frame)
+    try:
+        run(pipeline, 20)
+        assert pipeline.latest_display() == -19
+        assert pipeline.latest_display() is None
+        assert pipeline.poll_results() == []
+    finally:
+        pipeline.stop()
+
+def test_stop_joins_both_threads():
+    pipeline = ScanPipeline(CountingSource(10 ** 6), SlowDecoder())
+    pipeline.start()
+    threads = list(pipeline._threads)
+    assert len(threads) == 2 and all(t.is_alive() for t in threads)
+    time.sleep(0.05)
+    pipeline.stop()
+    assert not pipeline.running
+    assert not any(t.is_alive() for t in threads)
+    assert not any(t.name.startswith("scan-") for t in threading.enumerate())
+
+def test_latest_slot_overwrites_unread_items():
+    slot = LatestSlot()
+    assert slot.take(timeout=0) is None
+    slot.put(1)
+    slot.put(2)
+    assert slot.dropped == 1
+    assert slot.take(timeout=0) == 2
+    assert slot.take(timeout=0) is None
@@ -0,0 +1,111 @@
+"""
+@file test_segment_tree.py
+@brief range sums of SegmentTree and SalesTree against brute force sums
+"""
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+from segment_tree import SalesTree, SegmentTree
+
+def history(rows):
+    """@brief history DataFrame from (timestamp, total, qty) tuples"""
+    return pd.DataFrame(rows, columns=["timestamp", "total", "qty"])
+
+def brute_sum(rows, start, end):
+    day = lambda ts: pd.Timestamp(ts).date()
+    picked = [r for r in rows if (start is None or day(r[0]) >= start) and (end is None or day(r[0]) <= end)]
+    return sum(r[1] for r in picked), sum(r[2] for r in picked)
+
+
+def test_segment_tree_matches_brute_force():
+    rng = random.Random(1)
+    values = [rng.randrange(1000) for _ in range(37)]
+    tree = SegmentTree(64, values)
+    for _ in range(200):
+        l, r = sorted(rng.randrange(37) for _ in range(2))
+        assert tree.get_total_sum(l, r) == sum(values[l:r + 1])
+
+def test_segment_tree_updates():
+    tree = SegmentTree(8, [1, 2, 3, 4])
+    tree.add(1, 10)
+    tree.update_value(3, 0)
+    assert tree.get_total_sum(0, 3) == 1 + 12 + 3 + 0
+    assert tree.get_stats() == 16
+
+def test_segment_tree_clamps_and_inverted_range():
+    tree = SegmentTree(4, [1, 2, 3, 4])
+    assert tree.get_total_sum(-5, 1) == 3
+    assert tree.get_total_sum(2, 100) == 7
+    assert tree.get_total_sum(3, 1) == 0
+
+def test_segment_tree_zero_size():
+    tree = SegmentTree(0)
+    assert tree.size == 1
+    assert tree.get_total_sum(0, 0) == 0
+
+
+def test_empty_sales_tree():
+    tree = SalesTree()
+    assert tree.range_sum() == (0, 0)
+    assert tree.range_sum(date(2024, 1, 1), date(2024, 12, 31)) == (0, 0)
+    assert SalesTree.from_history(history([])).range_sum() == (0, 0)
+
+def test_range_before_origin_and_inverted():
+    tree = SalesTree.from_history(history([("2024-03-10 09:00:00", 100, 1), ("2024-03-12 10:00:00", 50, 2)]))
+    assert tree.range_sum(date(2024, 1, 1), date(2024, 2, 1)) == (0, 0)
+    assert tree.range_sum(date(2024, 1, 1), date(2024, 3, 10)) == (100, 1)
+    assert tree.range_sum(date(2024, 3, 12), date(2024, 3, 10)) == (0, 0)
+    assert tree.range_sum(date(2025, 1, 1), None) == (0, 0)
+
+def test_add_sale_before_origin_shifts_buckets():
+    rows = [("2024-03-10 09:00:00", 100, 1), ("2024-03-20 10:00:00", 50, 2)]
+    tree = SalesTree.from_history(history(rows))
+    tree.add_sale("2024-02-01 08:00:00", 7, 3)
+    rows.append(("2024-02-01 08:00:00", 7, 3))
+    assert tree.origin == date(2024, 2, 1)
+    for start, end in [(None, None), (date(2024, 2, 1), date(2024, 2, 1)), (date(2024, 3, 10), date(2024, 3, 19)),
+                       (date(2024, 3, 20), None)]:
+        assert tree.range_sum(start, end) == brute_sum(rows, start, end)
+
+def test_growth_past_capacity():
+    tree = SalesTree(capacity=4)
+    rows = []
+    for i in range(0, 40, 3):
+        ts = f"{date(2024, 1, 1) + timedelta(days=i)} 12:00:00"
+        tree.add_sale(ts, i * 10, 1)
+        rows.append((ts, i * 10, 1))
+    assert tree.revenue.size > 4
+    for start, end in [(None, None), (date(2024, 1, 5), date(2024, 1, 30)), (date(2024, 2, 1), None)]:
+        assert tree.range_sum(start, end) == brute_sum(rows, start, end)
+
+def test_random_ranges_match_brute_force():
+    rng = random.Random(2)
+    origin = date(2024, 1, 1)
+    rows = [(f"{origin + timedelta(days=rng.randrange(90))} 10:00:00", rng.randrange(1, 5000), rng.randrange(1, 5))
+            for _ in range(500)]
+    tree = SalesTree.from_history(history(rows))
+    for _ in range(300):
+        a, b = (origin + timedelta(days=rng.randrange(-10, 100)) for _ in range(2))
+        assert tree.range_sum(a, b) == brute_sum(rows, a, b)
+
+def test_integer_revenue_stays_integer():
+    tree = SalesTree.from_history(history([("2024-03-10 09:00:00", 7094000, 2), ("2024-03-11 09:00:00", 1, 1)]))
+    revenue, qty = tree.range_sum()
+    assert revenue == 7094001 and isinstance(revenue, int)
+    assert isinstance(qty, int)
+
+def test_from_chunks_matches_from_history():
+    rng = random.Random(3)
+    origin = date(2024, 1, 1)
+    rows = [(f"{origin + timedelta(days=rng.randrange(60))} 10:00:00", rng.randrange(1, 500), rng.randrange(1, 5))
+            for _ in range(200)]
+    # unsorted chunks, the later ones reach back before the first chunk's first day
+    chunks = [history(rows[i:i + 37]) for i in range(0, len(rows), 37)] + [history([])]
+    tree = SalesTree.from_chunks(chunks)
+    whole = SalesTree.from_history(history(rows))
+    assert tree.origin == whole.origin
+    for _ in range(100):
+        a, b = (origin + timedelta(days=rng.randrange(-5, 65)) for _ in range(2))
+        assert tree.range_sum(a, b) == whole.range_sum(a, b) == brute_sum(rows, a, b)
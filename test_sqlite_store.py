@@ -0,0 +1,55 @@
+"""
+@file test_sqlite_store.py
+@brief several cashier processes checking out into one SQLite database at the same time
+"""
+import multiprocessing
+
+import pandas as pd
+
+from data_manager import DataManager
+
+PROCESSES = 3
+CHECKOUTS = 40
+
+def cart(worker, i):
+    """@brief two items with a total unique to (worker, i)"""
+    ts = f"2024-03-{1 + i % 28:02d} 10:{worker:02d}:00"
+    return [{"product_name": "Beras", "price": 1000 + worker, "qty": 1, "total": 1000 + worker, "timestamp": ts},
+            {"product_name": "Kopi", "price": i, "qty": 2, "total": 2 * i, "timestamp": ts}]
+
+def checkout(products, db, worker, start):
+    """@brief one cashier process"""
+    dm = DataManager(products, db)
+    start.wait()
+    for i in range(CHECKOUTS):
+        dm.record_transaction(cart(worker, i))
+    dm.close()
+
+
+def test_concurrent_checkouts_lose_nothing(tmp_path):
+    products = str(tmp_path / "products.csv")
+    db = str(tmp_path / "store.db")
+    pd.DataFrame([{"name": "Beras", "price": 1000, "category": "Sembako", "qr_data": "QR1"},
+                  {"name": "Kopi", "price": 3000, "category": "Minuman", "qr_data": "QR2"}]).to_csv(products, index=False)
+    # schema and products table in place before the cashiers race to open it
+    DataManager(products, db).close()
+
+    ctx = multiprocessing.get_context("spawn")
+    start = ctx.Event()
+    procs = [ctx.Process(target=checkout, args=(products, db, worker, start)) for worker in range(PROCESSES)]
+    for proc in procs:
+        proc.start()
+    start.set()
+    for proc in procs:
+        proc.join(60)
+    assert [proc.exitcode for proc in procs] == [0] * PROCESSES
+
+    expected = [row for worker in range(PROCESSES) for i in range(CHECKOUTS) for row in cart(worker, i)]
+    dm = DataManager(products, db)
+    try:
+        history = dm.history_store.load()
+        assert len(history) == len(expected)
+        assert dm.sales_totals() == (sum(r["total"] for r in expected), sum(r["qty"] for r in expected))
+        assert sorted(history["total"].tolist()) == sorted(r["total"] for r in expected)
+    finally:
+        dm.close()
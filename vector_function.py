@@ -0,0 +1,149 @@
+"""
+@file vector_function.py
+@brief columnar (pandas/numpy) versions of the custom_function aggregations.
+Every function takes a sales history DataFrame and returns exactly what its
+custom_function counterpart returns for the equivalent list of dicts.
+The aggregations also take an iterable of DataFrame chunks (HistoryStore.iter_chunks)
+and merge per chunk partial results, memory then grows with the groups, not the rows.
+"""
+import numpy as np
+import pandas as pd
+
+from custom_function import parse_date
+
+def to_frame(df):
+    """
+    @brief copy of a sales history DataFrame with parsed timestamps, in timestamp order
+    @param df DataFrame with product_name, price, qty, total, timestamp columns
+    """
+    frame = df.copy()
+    frame['timestamp'] = pd.to_datetime(frame['timestamp'])
+    if not frame['timestamp'].is_monotonic_increasing:
+        frame = frame.sort_values('timestamp', kind='stable', ignore_index=True)
+    return frame
+
+def filter_by_date(frame, start_str, end_str):
+    """
+    @brief rows with start <= timestamp <= end + 1 day, same bounds as filter_data_by_date
+    @param frame history from to_frame
+    @param start_str YYYY-MM-DD or empty
+    @param end_str YYYY-MM-DD or empty
+    """
+    start_date = parse_date(start_str) if start_str else None
+    end_date = parse_date(end_str) if end_str else None
+
+    ts = frame['timestamp']
+    if ts.is_monotonic_increasing:
+        # sorted history: two binary searches instead of a full mask
+        values = ts.to_numpy()
+        left = 0 if start_date is None else np.searchsorted(values, np.datetime64(start_date), side='left')
+        right = len(values) if end_date is None else np.searchsorted(
+            values, np.datetime64(end_date + pd.Timedelta(days=1)), side='right')
+        return frame.iloc[left:right]
+
+    mask = np.ones(len(frame), dtype=bool)
+    if start_date is not None:
+        mask &= (ts >= start_date).to_numpy()
+    if end_date is not None:
+        mask &= (ts <= end_date + pd.Timedelta(days=1)).to_numpy()
+    return frame[mask]
+
+def add_categories(frame, product_map):
+    """
+    @brief attach a category column, products missing from product_map are "Uncategorized"
+    """
+    names = frame['product_name']
+    categories = names.map(product_map)
+    categories = categories.where(names.isin(product_map.keys()), "Uncategorized")
+    return frame.assign(category=categories)
+
+def _categories(frame):
+    if 'category' in frame:
+        return frame['category']
+    return pd.Series("Uncategorized", index=frame.index)
+
+def _chunks(frame):
+    return (frame,) if isinstance(frame, pd.DataFrame) else frame
+
+def _add_totals(acc, grouped):
+    """
+    @brief add a grouped total Series into acc, keys in order of first appearance
+    """
+    for key, value in zip(grouped.index, grouped.tolist()):
+        acc[key] = acc.get(key, 0) + value
+
+def get_stats(frame, product_map=None):
+    """
+    @brief total revenue, quantity, and top category by revenue
+    @param frame history rows or chunks of them, with a category column or a product_map to build it
+    """
+    total_revenue = 0
+    total_qty = 0
+    cat_rev = {}
+    for chunk in _chunks(frame):
+        if chunk.empty:
+            continue
+        if product_map is not None:
+            chunk = add_categories(chunk, product_map)
+        total_revenue += chunk['total'].sum().item()
+        total_qty += chunk['qty'].sum().item()
+        _add_totals(cat_rev, chunk.groupby(_categories(chunk), sort=False, dropna=False)['total'].sum())
+    if not cat_rev:
+        return 0, 0, "-"
+
+    # first category reaching the max wins, like new_max over an insertion ordered dict
+    top_cat = max(cat_rev, key=cat_rev.get)
+    return total_revenue, total_qty, top_cat
+
+def category_totals(frame):
+    """
+    @brief revenue per category in order of first appearance
+    @return dict {category: revenue}
+    """
+    cat_rev = {}
+    for chunk in _chunks(frame):
+        _add_totals(cat_rev, chunk.groupby(_categories(chunk), sort=False, dropna=False)['total'].sum())
+    return cat_rev
+
+def group_by_time(frame, mode="Day"):
+    """
+    @brief revenue per day or per month ("Month"), keys sorted ascending
+    @return (list of datetime, list of revenue)
+    """
+    grouped = None
+    for chunk in _chunks(frame):
+        if chunk.empty:
+            continue
+        if mode == "Month":
+            keys = chunk['timestamp'].dt.to_period('M').dt.to_timestamp()
+        else:
+            keys = chunk['timestamp'].dt.normalize()
+        part = chunk['total'].groupby(keys.to_numpy(), sort=True).sum()
+        grouped = part if grouped is None else pd.concat([grouped, part]).groupby(level=0, sort=True).sum()
+    if grouped is None:
+        return [], []
+    return list(grouped.index.to_pydatetime()), grouped.tolist()
+
+def group_hierarchy(frame):
+    """
+    @brief groups data by Category
+    Structure: { 'Category': { 'total_rev', 'total_qty', 'products': { 'Product': {'rev', 'qty'} } } }
+    """
+    tree_data = {}
+    for chunk in _chunks(frame):
+        if chunk.empty:
+            continue
+        grouped = chunk.groupby([_categories(chunk), chunk['product_name']], sort=False, dropna=False,
+                                observed=True)[['total', 'qty']].sum()
+        for (cat, prod), rev, qty in zip(grouped.index, grouped['total'].tolist(), grouped['qty'].tolist()):
+            if cat not in tree_data:
+                tree_data[cat] = {'total_rev': 0, 'total_qty': 0, 'products': {}}
+            tree_data[cat]['total_rev'] += rev
+            tree_data[cat]['total_qty'] += qty
+            cell = tree_data[cat]['products'].get(prod)
+            if cell is None:
+                tree_data[cat]['products'][prod] = {'rev': rev, 'qty': qty}
+            else:
+                cell['rev'] += rev
+                cell['qty'] += qty
+    return tree_data